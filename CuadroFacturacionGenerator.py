@@ -1,142 +1,412 @@
 import pandas as pd
-from collections import defaultdict
+import numpy as np
+import cProfile
+import io
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-import locale
+from functools import lru_cache, wraps
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from ingesta_conglomerado import COLUMNAS_CONGLOMERADO, iterar_conglomerado, leer_conglomerado
+
+# Campos que forman la clave de agrupación (en el orden de la clave)
+COLUMNAS_CLAVE = [
+    "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
+    "Documento", "NOMBRE USUARIO", "AUT", "FECHA INI AUT", "FECHA FINAL"
+]
+
+COLUMNAS_AGRUPADAS = [
+    "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
+    "NOMBRE USUARIO", "Documento", "AUT", "FECHA INI AUT", "FECHA FINAL",
+    "NO de sesiones", "Fechas de atención DIAS Y MESES"
+]
+
+MESES_ES = np.array([
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+], dtype=object)
+
+# Texto de cada día del mes, precalculado (índice = día)
+DIAS_TEXTO = tuple(str(d) for d in range(32))
+
+HOJA_CUADRO = "CUADRO SESIONES REALIZADAS"
+
+# Carpeta donde se guarda un perfil (cProfile + tracemalloc) por generación; vacío = desactivado
+DIRECTORIO_PERFILES = os.getenv("GENERADOR_PERFIL_DIR") or None
+
+logger = logging.getLogger(__name__)
+
+
+def nombre_archivo_cuadro(nombre_profesional):
+    """Nombre del archivo de salida para el cuadro de un profesional"""
+    nombre = re.sub(r'[\\/:*?"<>|]', "", str(nombre_profesional)).replace(" ", "_")
+    return f"CUADRO_{nombre}.xlsx"
+
+
+def _nombre_unico(nombre, usados, max_largo=None):
+    # Excel limita el nombre de hoja a 31 caracteres; se agrega sufijo si se repite
+    base = nombre[:max_largo] if max_largo else nombre
+    candidato, n = base, 2
+    while candidato.lower() in usados:
+        sufijo = f" ({n})"
+        candidato = (base[:max_largo - len(sufijo)] if max_largo else base) + sufijo
+        n += 1
+    usados.add(candidato.lower())
+    return candidato
+
+
+def _valor_celda(valor):
+    # Convierte valores de pandas/numpy a tipos que openpyxl escribe igual que to_excel
+    if valor is None or valor is pd.NaT:
+        return None
+    if isinstance(valor, float) and valor != valor:
+        return None
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+        return None if isinstance(valor, float) and valor != valor else valor
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor
+
+
+def _agregar_hoja(wb, titulo, df):
+    # Escribe el DataFrame fila por fila en una hoja de un libro en modo write_only
+    ws = wb.create_sheet(titulo)
+    ws.append([str(c) for c in df.columns])
+    _agregar_filas(ws, df)
+    return ws
+
+
+def _agregar_filas(ws, df):
+    for fila in df.itertuples(index=False, name=None):
+        valores = [_valor_celda(v) for v in fila]
+        for i, valor in enumerate(valores):
+            if isinstance(valor, datetime):
+                celda = WriteOnlyCell(ws, value=valor)
+                celda.number_format = "YYYY-MM-DD HH:MM:SS"
+                valores[i] = celda
+        ws.append(valores)
+
+
+@lru_cache(maxsize=65536)
+def formatear_dias(dias):
+    """
+    Formatea días ordenados como "días y meses", p. ej. "3, 10 enero, 2 febrero"
+
+    Args:
+        dias (tuple): Días como enteros (días desde 1970-01-01), en orden ascendente
+
+    Returns:
+        str: Días agrupados por mes; el mismo mes de años distintos va por separado
+    """
+    fechas = np.array(dias, dtype="datetime64[D]")
+    meses = fechas.astype("datetime64[M]")
+    dias_del_mes = ((fechas - meses).astype(np.int64) + 1).tolist()
+
+    partes = []
+    mes_actual = None
+    for mes, dia in zip(meses.astype(np.int64).tolist(), dias_del_mes):
+        if mes != mes_actual:
+            mes_actual = mes
+            partes.append((MESES_ES[mes % 12], []))
+        partes[-1][1].append(DIAS_TEXTO[dia])
+
+    return ", ".join(f"{', '.join(d)} {nombre_mes}" for nombre_mes, d in partes)
+
+
+def codigos_clave(df):
+    """
+    Numera las claves de 8 campos de cada fila en orden de primera aparición
+
+    Equivale a groupby(COLUMNAS_CLAVE, sort=False, dropna=False).ngroup(), pero combina
+    códigos enteros de cada columna (los de las categorías de la ingesta, o factorizados)
+    en un solo entero por fila en vez de comparar tuplas de objetos.
+
+    Args:
+        df (pandas.DataFrame): Filas con las columnas de COLUMNAS_CLAVE
+
+    Returns:
+        numpy.ndarray: Código de grupo (int64) por fila
+    """
+    empaquetado = np.zeros(len(df), dtype=np.int64)
+    cardinalidad = 1
+    for columna in COLUMNAS_CLAVE:
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # El código -1 (vacío) pasa a 0
+            codigos = serie.cat.codes.to_numpy().astype(np.int64) + 1
+            distintos = len(serie.cat.categories) + 1
+        else:
+            codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+            distintos = max(len(unicos), 1)
+
+        if cardinalidad * distintos >= 2 ** 62:
+            # Se renumera lo acumulado para que la combinación no desborde int64
+            empaquetado, unicos = pd.factorize(empaquetado)
+            cardinalidad = len(unicos)
+        empaquetado = empaquetado * distintos + codigos
+        cardinalidad *= distintos
+
+    return pd.factorize(empaquetado)[0].astype(np.int64)
+
+
+def _decodificar_categorias(df):
+    # Cada tramo de un categórico arrastra el diccionario completo (todos los usuarios, AUT y
+    # profesionales); antes de enviarlo a otro proceso se pasa a valores sueltos
+    for columna in df.columns:
+        if isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype(object)
+    return df
+
+
+def _rss_mb():
+    # Memoria residente actual del proceso (solo Linux); None si no se puede leer
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MetricasGeneracion:
+    """
+    Tiempos por etapa y conteos de una generación
+
+    Attributes:
+        operacion (str): Método del generador que se ejecutó
+        etapas (dict): Por etapa: segundos, llamadas y memoria_mb (variación de RSS acumulada)
+        conteos (dict): filas, filas_filtradas, grupos, profesionales (según la operación)
+        segundos_total (float): Duración de toda la operación
+        perfil (dict): Rutas del perfil cProfile y del reporte de tracemalloc, si se pidieron
+    """
+
+    def __init__(self, operacion):
+        self.operacion = operacion
+        self.etapas = {}
+        self.conteos = {}
+        self.segundos_total = None
+        self.perfil = {}
+
+    @contextmanager
+    def etapa(self, nombre):
+        # Las etapas que se repiten (p. ej. una por profesional) se acumulan
+        rss_antes = _rss_mb()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            rss_despues = _rss_mb()
+            medida = self.etapas.setdefault(nombre, {"segundos": 0.0, "llamadas": 0, "memoria_mb": None})
+            medida["segundos"] += segundos
+            medida["llamadas"] += 1
+            if rss_antes is not None and rss_despues is not None:
+                medida["memoria_mb"] = (medida["memoria_mb"] or 0.0) + rss_despues - rss_antes
+
+    def contar(self, **conteos):
+        self.conteos.update(conteos)
+
+    def sumar(self, **conteos):
+        for nombre, valor in conteos.items():
+            self.conteos[nombre] = self.conteos.get(nombre, 0) + valor
+
+    def a_dict(self):
+        return {
+            "operacion": self.operacion,
+            "segundos_total": self.segundos_total,
+            "etapas": self.etapas,
+            "conteos": self.conteos,
+            "perfil": self.perfil,
+        }
+
+    def resumen(self):
+        """Una línea legible, p. ej. para el log o para adjuntar a un reporte"""
+        etapas = ", ".join(f"{nombre} {m['segundos']:.2f}s" for nombre, m in self.etapas.items())
+        conteos = ", ".join(f"{nombre}={valor}" for nombre, valor in self.conteos.items())
+        return f"{self.operacion}: {self.segundos_total:.2f}s [{etapas}] {conteos}"
+
+
+def _instrumentado(metodo):
+    # Mide la operación completa, deja el resultado en ultimas_metricas y, si hay
+    # directorio de perfiles, guarda un perfil cProfile y las asignaciones de tracemalloc
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        if self._metricas is not None:
+            # Llamada anidada: las etapas se suman a la operación en curso
+            return metodo(self, *args, **kwargs)
+
+        metricas = MetricasGeneracion(metodo.__name__)
+        self._metricas = metricas
+        inicio = time.perf_counter()
+        try:
+            # tracemalloc y el perfilador son de todo el proceso: solo una generación se perfila
+            # a la vez; las que coinciden con ella (p. ej. en la cola de trabajos) corren sin perfil
+            if not self.perfil_dir or not _perfil_lock.acquire(blocking=False):
+                if self.perfil_dir:
+                    logger.info("%s sin perfil: otra generación se está perfilando", metodo.__name__)
+                return metodo(self, *args, **kwargs)
+            try:
+                return _perfilar(self.perfil_dir, metricas, metodo, self, *args, **kwargs)
+            finally:
+                _perfil_lock.release()
+        finally:
+            metricas.segundos_total = time.perf_counter() - inicio
+            self._metricas = None
+            self.ultimas_metricas = metricas
+            logger.info(metricas.resumen())
+
+    return envoltura
+
+
+_perfil_lock = threading.Lock()
+
+
+def _perfilar(directorio, metricas, metodo, *args, **kwargs):
+    # Ejecuta el método con cProfile y tracemalloc; un fallo al perfilar no hace fallar la generación
+    propio = not tracemalloc.is_tracing()
+    if propio:
+        tracemalloc.start()
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        return metodo(*args, **kwargs)
+    finally:
+        perfil.disable()
+        try:
+            metricas.perfil = _guardar_perfil(directorio, metodo.__name__, perfil)
+        except Exception as e:
+            logger.warning("No se pudo guardar el perfil de %s: %s", metodo.__name__, e)
+        if propio:
+            tracemalloc.stop()
+
+
+def _guardar_perfil(directorio, operacion, perfil):
+    # Se llama con tracemalloc activo: guarda el .prof y las 25 líneas que más memoria asignaron
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.join(directorio, f"{operacion}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}")
+    actual, pico = tracemalloc.get_traced_memory()
+    estadisticas = tracemalloc.take_snapshot().statistics("lineno")[:25]
+    perfil.dump_stats(f"{base}.prof")
+
+    with open(f"{base}.tracemalloc.txt", "w", encoding="utf-8") as f:
+        f.write(f"actual {actual / 1024 / 1024:.1f} MB, pico {pico / 1024 / 1024:.1f} MB\n")
+        f.writelines(f"{estadistica}\n" for estadistica in estadisticas)
+
+    return {"cprofile": f"{base}.prof", "tracemalloc": f"{base}.tracemalloc.txt"}
+
 
 class CuadroFacturacionGenerator:
-  
 
-    def _formatear_fechas(self, fechas):
-        fechas_ordenadas = sorted(fechas, key=lambda x: datetime.strptime(x, "%Y-%m-%d"))
-        fechas_dict = defaultdict(list)
-
-        meses_es = {
-            "January": "enero", "February": "febrero", "March": "marzo",
-            "April": "abril", "May": "mayo", "June": "junio",
-            "July": "julio", "August": "agosto", "September": "septiembre",
-            "October": "octubre", "November": "noviembre", "December": "diciembre"
-        }
+    def __init__(self, cache=None, perfil_dir=DIRECTORIO_PERFILES, progreso=None):
+        # cache: CacheConglomerado opcional para no volver a parsear el mismo archivo
+        # perfil_dir: carpeta donde guardar un perfil por generación (None = sin perfil)
+        # progreso: función opcional que recibe el nombre de cada etapa al empezar
+        self.cache = cache
+        self.perfil_dir = perfil_dir
+        self.progreso = progreso
+        self.ultimas_metricas = None
+        self._metricas = None
+
+    def _etapa(self, nombre):
+        # Cronómetro de una etapa de la operación en curso (sin efecto fuera de una operación)
+        if self.progreso is not None:
+            self.progreso(nombre)
+        return self._metricas.etapa(nombre) if self._metricas is not None else nullcontext()
+
+    def _contar(self, **conteos):
+        if self._metricas is not None:
+            self._metricas.contar(**conteos)
+
+    def _sumar(self, **conteos):
+        if self._metricas is not None:
+            self._metricas.sumar(**conteos)
+
+    def _leer_conglomerado(self, conglomerado_path, profesionales=None):
+        with self._etapa("lectura"):
+            df = self._leer_conglomerado_sin_medir(conglomerado_path, profesionales)
+        self._contar(filas=len(df))
+        return df
+
+    def _leer_profesionales(self, conglomerado_path, nombres_profesionales):
+        # Filas de los profesionales indicados: con caché se toman del índice por posiciones,
+        # sin caché se filtran al leer y luego con isin
+        if self.cache is not None and not isinstance(conglomerado_path, pd.DataFrame):
+            with self._etapa("lectura"):
+                entrada = self.cache.obtener_conglomerado(conglomerado_path)
+            self._contar(filas=len(entrada.df))
+            with self._etapa("filtrado"):
+                return entrada.indice.filtrar(entrada.df, nombres_profesionales)
+
+        df = self._leer_conglomerado(conglomerado_path, nombres_profesionales)
+        with self._etapa("filtrado"):
+            return df[df["NOMBRE DEL PROFESIONAL"].isin(nombres_profesionales)]
+
+    def _leer_conglomerado_sin_medir(self, conglomerado_path, profesionales=None):
+        # conglomerado_path puede ser una ruta, bytes, un archivo abierto o un DataFrame
+        if isinstance(conglomerado_path, pd.DataFrame):
+            return conglomerado_path[COLUMNAS_CONGLOMERADO]
+        if self.cache is not None:
+            return self.cache.obtener_conglomerado(conglomerado_path).df
+        if isinstance(conglomerado_path, (bytes, bytearray, memoryview)):
+            conglomerado_path = io.BytesIO(conglomerado_path)
+        elif hasattr(conglomerado_path, "seek"):
+            conglomerado_path.seek(0)
+
+        # Sin caché se leen solo las columnas (y profesionales) necesarios
+        return leer_conglomerado(conglomerado_path, profesionales)
 
-        for fecha in fechas_ordenadas:
-            dt = datetime.strptime(fecha, "%Y-%m-%d")
-            mes = dt.strftime("%B")
-            dia = str(dt.day)
-            fechas_dict[mes].append(dia)
-
-        fechas_formateadas = []
-        for mes, dias in fechas_dict.items():
-            mes_es = meses_es.get(mes, mes)
-            fechas_formateadas.append(f"{', '.join(dias)} {mes_es}")
-
-        return ", ".join(fechas_formateadas)
-
-
-    def generar(self, conglomerado_path, output_path):
-        df = pd.read_excel(conglomerado_path, sheet_name="CONGLOMERADO", engine="openpyxl")
-        
-        df_filtered = df[[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "Documento", "NOMBRE USUARIO", "FECHA INI AUT", "FECHA FINAL", "AUT", "FECHA ATENCION"
-        ]]
-        
-        sesiones_dict = defaultdict(lambda: {"count": 0, "fechas": []})
-        
-        for _, row in df_filtered.iterrows():
-            clave = (
-                row["DOC PROFESIONAL"], row["NOMBRE DEL PROFESIONAL"], row["Tipo de nota"],
-                row["Documento"], row["NOMBRE USUARIO"], row["AUT"], row["FECHA INI AUT"],
-                row["FECHA FINAL"]
-            )
-            sesiones_dict[clave]["count"] += 1
-            sesiones_dict[clave]["fechas"].append(row["FECHA ATENCION"].date().isoformat())
-        
-        datos_expandidos = []
-        for clave, valores in sesiones_dict.items():
-            doc_profesional, nombre_profesional, tipo_nota, documento, nombre_usuario, autorizacion, fecha_ini_aut, fecha_final = clave
-            fechas_atencion = self._formatear_fechas(valores["fechas"])
-            
-            fila = [
-                doc_profesional, nombre_profesional, tipo_nota,
-                nombre_usuario, documento,
-                autorizacion, fecha_ini_aut, fecha_final,
-                valores["count"], fechas_atencion
-            ]
-            datos_expandidos.append(fila)
-        
-        df_grouped = pd.DataFrame(datos_expandidos, columns=[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "NOMBRE USUARIO", "Documento", "AUT", "FECHA INI AUT", "FECHA FINAL", 
-            "NO de sesiones", "Fechas de atención DIAS Y MESES"
-        ])
-        
-        df_grouped.rename(columns={
-            "DOC PROFESIONAL": "CC Profesional",
-            "NOMBRE DEL PROFESIONAL": "Nombre completo de profesional",
-            "Tipo de nota": "Area",
-            "Documento": "Doc Usuario",
-            "NOMBRE USUARIO": "Nombre completo de Usuario",
-            "FECHA INI AUT": "Fecha Inicial",
-            "FECHA FINAL": "Fecha Final",
-            "AUT": "No Autorización",
-        }, inplace=True)
-        
-        df_grouped.insert(0, "TIPO CONTRATO (OPS O NOMINA)", "Nomina")
-        df_grouped.insert(7, "SES AUTOR", "")
-        df_grouped.insert(11, "AUTOR", "")
-        df_grouped.insert(12, "GLOSAS", "")
-        df_grouped.insert(13, "RECONOCE LA EMPRESA", "")
-        
-        df_grouped["Valor"] = df_grouped["NO de sesiones"] * 4500
-        df_grouped["Fecha Inicial"] = ""
-        df_grouped["Fecha Final"] = ""
-        
-        df_grouped.to_excel(output_path, sheet_name="CUADRO SESIONES REALIZADAS", index=False, engine="openpyxl")
-
-    def generar_filtrado_por_profesional(self, conglomerado_path, output_path, nombre_profesional):
-        df = pd.read_excel(conglomerado_path, sheet_name="CONGLOMERADO", engine="openpyxl")
-
-        # Filtrar por el nombre del profesional
-        df = df[df["NOMBRE DEL PROFESIONAL"] == nombre_profesional]
-
-        if df.empty:
-            raise ValueError(f"No se encontraron registros para el profesional: {nombre_profesional}")
-
-        df_filtered = df[[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "Documento", "NOMBRE USUARIO", "FECHA INI AUT", "FECHA FINAL", "AUT", "FECHA ATENCION"
-        ]]
-
-        sesiones_dict = defaultdict(lambda: {"count": 0, "fechas": []})
-
-        for _, row in df_filtered.iterrows():
-            clave = (
-                row["DOC PROFESIONAL"], row["NOMBRE DEL PROFESIONAL"], row["Tipo de nota"],
-                row["Documento"], row["NOMBRE USUARIO"], row["AUT"], row["FECHA INI AUT"],
-                row["FECHA FINAL"]
-            )
-            sesiones_dict[clave]["count"] += 1
-            sesiones_dict[clave]["fechas"].append(row["FECHA ATENCION"].date().isoformat())
-
-        datos_expandidos = []
-        for clave, valores in sesiones_dict.items():
-            doc_profesional, nombre_profesional, tipo_nota, documento, nombre_usuario, autorizacion, fecha_ini_aut, fecha_final = clave
-            fechas_atencion = self._formatear_fechas(valores["fechas"])
-
-            fila = [
-                doc_profesional, nombre_profesional, tipo_nota,
-                nombre_usuario, documento,
-                autorizacion, fecha_ini_aut, fecha_final,
-                valores["count"], fechas_atencion
-            ]
-            datos_expandidos.append(fila)
-
-        df_grouped = pd.DataFrame(datos_expandidos, columns=[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "NOMBRE USUARIO", "Documento", "AUT", "FECHA INI AUT", "FECHA FINAL",
-            "NO de sesiones", "Fechas de atención DIAS Y MESES"
-        ])
-
-        df_grouped.rename(columns={
+    def _formatear_fechas(self, fechas):
+        # Acepta textos ISO, date/datetime o datetime64; el resultado se memoriza por conjunto de días
+        dias = np.sort(np.asarray(list(fechas), dtype="datetime64[D]").astype(np.int64))
+        return formatear_dias(tuple(dias.tolist()))
+
+    def _agrupar_sesiones(self, df_filtered):
+        """
+        Agrupa las atenciones por la clave de 8 campos sin recorrer filas en Python
+
+        Devuelve una fila por clave, en el orden de primera aparición, con el número de
+        sesiones y las fechas de atención formateadas como "días y meses". El texto se
+        arma una vez por grupo con formatear_dias, que memoriza los conjuntos repetidos.
+        """
+        if df_filtered.empty:
+            return pd.DataFrame(columns=COLUMNAS_AGRUPADAS)
+
+        with self._etapa("agregacion"):
+            codigos, dias, orden = self._codificar_grupos(df_filtered)
+        with self._etapa("formateo"):
+            cortes = np.flatnonzero(np.diff(codigos[orden])) + 1
+            fechas_texto = [formatear_dias(tuple(tramo.tolist())) for tramo in np.split(dias[orden], cortes)]
+        with self._etapa("agregacion"):
+            _, primeras_filas = np.unique(codigos, return_index=True)
+            df_grouped = df_filtered.iloc[primeras_filas][COLUMNAS_AGRUPADAS[:8]].reset_index(drop=True)
+            df_grouped["NO de sesiones"] = np.bincount(codigos)
+            df_grouped["Fechas de atención DIAS Y MESES"] = fechas_texto
+        self._sumar(grupos=len(df_grouped))
+        return df_grouped
+
+    def _codificar_grupos(self, df_filtered):
+        fechas = pd.to_datetime(df_filtered["FECHA ATENCION"])
+        if fechas.isna().any():
+            raise ValueError("Hay registros sin FECHA ATENCION")
+
+        # Código de grupo por fila: los grupos se numeran en orden de primera aparición
+        codigos = codigos_clave(df_filtered)
+        dias = fechas.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        # Ordenar por grupo y fecha; el arreglo de días se parte luego en un tramo por grupo
+        return codigos, dias, np.lexsort((dias, codigos))
+
+    def _construir_cuadro(self, df_grouped):
+        df_grouped = df_grouped.rename(columns={
             "DOC PROFESIONAL": "CC Profesional",
             "NOMBRE DEL PROFESIONAL": "Nombre completo de profesional",
             "Tipo de nota": "Area",
@@ -145,7 +415,7 @@ class CuadroFacturacionGenerator:
             "FECHA INI AUT": "Fecha Inicial",
             "FECHA FINAL": "Fecha Final",
             "AUT": "No Autorización",
-        }, inplace=True)
+        })
 
         df_grouped.insert(0, "TIPO CONTRATO (OPS O NOMINA)", "Nomina")
         df_grouped.insert(7, "SES AUTOR", "")
@@ -156,69 +426,274 @@ class CuadroFacturacionGenerator:
         df_grouped["Valor"] = df_grouped["NO de sesiones"] * 4500
         df_grouped["Fecha Inicial"] = ""
         df_grouped["Fecha Final"] = ""
-
-        df_grouped.to_excel(output_path, sheet_name="CUADRO SESIONES REALIZADAS", index=False, engine="openpyxl")
-
+        return df_grouped
+
+    def _escribir_cuadro(self, df_grouped, output_path=None):
+        # Libro write_only: las filas se vuelcan a disco a medida que se agregan.
+        # Sin output_path se escribe en memoria y se devuelve el BytesIO
+        salida = io.BytesIO() if output_path is None else output_path
+        with self._etapa("escritura"):
+            wb = Workbook(write_only=True)
+            _agregar_hoja(wb, HOJA_CUADRO, df_grouped)
+            wb.save(salida)
+        if output_path is None:
+            salida.seek(0)
+            return salida
+
+    @_instrumentado
+    def generar(self, conglomerado_path, output_path=None):
+        df_filtered = self._leer_conglomerado(conglomerado_path)
+        df_grouped = self._construir_cuadro(self._agrupar_sesiones(df_filtered))
+
+        return self._escribir_cuadro(df_grouped, output_path)
+
+    @_instrumentado
     def generar_filtrado_por_profesional(self, conglomerado_path, output_path, nombres_profesionales: list):
-        df = pd.read_excel(conglomerado_path, sheet_name="CONGLOMERADO", engine="openpyxl")
-
         # ✅ Filtra los registros por la lista de nombres seleccionados
-        df = df[df["NOMBRE DEL PROFESIONAL"].isin(nombres_profesionales)]
-
-        df_filtered = df[[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "Documento", "NOMBRE USUARIO", "FECHA INI AUT", "FECHA FINAL", "AUT", "FECHA ATENCION"
-        ]]
-
-        sesiones_dict = defaultdict(lambda: {"count": 0, "fechas": []})
-
-        for _, row in df_filtered.iterrows():
-            clave = (
-                row["DOC PROFESIONAL"], row["NOMBRE DEL PROFESIONAL"], row["Tipo de nota"],
-                row["Documento"], row["NOMBRE USUARIO"], row["AUT"], row["FECHA INI AUT"],
-                row["FECHA FINAL"]
-            )
-            sesiones_dict[clave]["count"] += 1
-            sesiones_dict[clave]["fechas"].append(row["FECHA ATENCION"].date().isoformat())
-
-        datos_expandidos = []
-        for clave, valores in sesiones_dict.items():
-            doc_profesional, nombre_profesional, tipo_nota, documento, nombre_usuario, autorizacion, fecha_ini_aut, fecha_final = clave
-            fechas_atencion = self._formatear_fechas(valores["fechas"])
-
-            fila = [
-                doc_profesional, nombre_profesional, tipo_nota,
-                nombre_usuario, documento,
-                autorizacion, fecha_ini_aut, fecha_final,
-                valores["count"], fechas_atencion
-            ]
-            datos_expandidos.append(fila)
-
-        df_grouped = pd.DataFrame(datos_expandidos, columns=[
-            "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
-            "NOMBRE USUARIO", "Documento", "AUT", "FECHA INI AUT", "FECHA FINAL", 
-            "NO de sesiones", "Fechas de atención DIAS Y MESES"
-        ])
-
-        df_grouped.rename(columns={
-            "DOC PROFESIONAL": "CC Profesional",
-            "NOMBRE DEL PROFESIONAL": "Nombre completo de profesional",
-            "Tipo de nota": "Area",
-            "Documento": "Doc Usuario",
-            "NOMBRE USUARIO": "Nombre completo de Usuario",
-            "FECHA INI AUT": "Fecha Inicial",
-            "FECHA FINAL": "Fecha Final",
-            "AUT": "No Autorización",
-        }, inplace=True)
+        df = self._leer_profesionales(conglomerado_path, nombres_profesionales)
+        self._contar(filas_filtradas=len(df), profesionales=len(nombres_profesionales))
+
+        df_filtered = df[COLUMNAS_CONGLOMERADO]
+        df_grouped = self._construir_cuadro(self._agrupar_sesiones(df_filtered))
+
+        return self._escribir_cuadro(df_grouped, output_path)
+
+    @_instrumentado
+    def generar_todos_por_profesional(self, conglomerado_path, output_path, formato="zip"):
+        """
+        Genera el cuadro de cada profesional leyendo el conglomerado una sola vez
+
+        Args:
+            conglomerado_path: Ruta (o archivo) del Excel con la hoja CONGLOMERADO
+            output_path: Ruta (o archivo) donde se escribe el resultado
+            formato (str): "zip" para un .xlsx por profesional dentro de un ZIP,
+                "libro" para un solo libro con una hoja por profesional
+
+        Returns:
+            list: Nombres de los profesionales generados, en orden alfabético
+        """
+        if formato not in ("zip", "libro"):
+            raise ValueError(f"Formato no soportado: {formato}")
+
+        df_filtered = self._leer_conglomerado(conglomerado_path)
+
+        # Los grupos se recorren de a uno: solo hay en memoria el conglomerado y un profesional a la vez
+        with self._etapa("filtrado"):
+            grupos = df_filtered.groupby("NOMBRE DEL PROFESIONAL", sort=True, observed=True)
+        self._contar(profesionales=grupos.ngroups)
+        generados = []
+        usados = set()
+
+        if formato == "zip":
+            # Los .xlsx ya van comprimidos: se guardan sin recomprimir
+            with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as zf:
+                for nombre_profesional, df_profesional in grupos:
+                    df_grouped = self._construir_cuadro(self._agrupar_sesiones(df_profesional))
+                    buffer = io.BytesIO()
+                    self._escribir_cuadro(df_grouped, buffer)
+                    zf.writestr(_nombre_unico(nombre_archivo_cuadro(nombre_profesional), usados), buffer.getvalue())
+                    generados.append(nombre_profesional)
+        else:
+            wb = Workbook(write_only=True)
+            for nombre_profesional, df_profesional in grupos:
+                df_grouped = self._construir_cuadro(self._agrupar_sesiones(df_profesional))
+                hoja = re.sub(r"[\[\]:*?/\\]", "", str(nombre_profesional)) or "Profesional"
+                with self._etapa("escritura"):
+                    _agregar_hoja(wb, _nombre_unico(hoja, usados, 31), df_grouped)
+                generados.append(nombre_profesional)
+            with self._etapa("escritura"):
+                wb.save(output_path)
+
+        return generados
+
+    @_instrumentado
+    def exportar_en_paralelo(self, conglomerado_path, output_dir, max_workers=None):
+        """
+        Escribe un .xlsx por profesional en output_dir usando varios procesos
+
+        La agrupación se hace una sola vez en el proceso principal; cada worker recibe
+        el cuadro ya agrupado de un profesional y solo se encarga de escribirlo.
+
+        Args:
+            conglomerado_path: Ruta (o archivo) del Excel con la hoja CONGLOMERADO
+            output_dir (str): Carpeta de salida (se crea si no existe)
+            max_workers (int, optional): Número de procesos; None usa os.cpu_count()
+                y 1 escribe en serie en el proceso actual
+
+        Returns:
+            dict: Archivos generados (en orden alfabético de profesional) y tiempos
+                por archivo, por worker y totales
+        """
+        df_filtered = self._leer_conglomerado(conglomerado_path)
+
+        df_agrupado = self._agrupar_sesiones(df_filtered)
+        os.makedirs(output_dir, exist_ok=True)
+
+        tareas = []
+        usados = set()
+        for nombre_profesional, df_profesional in df_agrupado.groupby("NOMBRE DEL PROFESIONAL", sort=True, observed=True):
+            ruta = os.path.join(output_dir, _nombre_unico(nombre_archivo_cuadro(nombre_profesional), usados))
+            cuadro = _decodificar_categorias(self._construir_cuadro(df_profesional.reset_index(drop=True)))
+            tareas.append((nombre_profesional, ruta, cuadro))
+        self._contar(profesionales=len(tareas))
+
+        inicio = time.perf_counter()
+        with self._etapa("escritura"):
+            if max_workers == 1:
+                resultados = [_escribir_cuadro_worker(df_grouped, ruta) for _, ruta, df_grouped in tareas]
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    futuros = [pool.submit(_escribir_cuadro_worker, df_grouped, ruta) for _, ruta, df_grouped in tareas]
+                    resultados = [futuro.result() for futuro in futuros]
+        tiempo_total = time.perf_counter() - inicio
+
+        archivos = []
+        por_worker = {}
+        for (nombre_profesional, ruta, _), (pid, segundos) in zip(tareas, resultados):
+            archivos.append({"profesional": nombre_profesional, "ruta": ruta, "worker": pid, "segundos": segundos})
+            resumen = por_worker.setdefault(pid, {"archivos": 0, "segundos": 0.0})
+            resumen["archivos"] += 1
+            resumen["segundos"] += segundos
+
+        # Para medir la aceleración, comparar tiempo_total contra una corrida con max_workers=1
+        return {
+            "archivos": archivos,
+            "por_worker": por_worker,
+            "workers": 1 if max_workers == 1 else len(por_worker),
+            "tiempo_total": tiempo_total,
+        }
 
-        df_grouped.insert(0, "TIPO CONTRATO (OPS O NOMINA)", "Nomina")
-        df_grouped.insert(7, "SES AUTOR", "")
-        df_grouped.insert(11, "AUTOR", "")
-        df_grouped.insert(12, "GLOSAS", "")
-        df_grouped.insert(13, "RECONOCE LA EMPRESA", "")
+    @_instrumentado
+    def actualizar_por_profesional(self, conglomerado_path, output_dir, ruta_estado, verificar=False):
+        """
+        Mantiene en output_dir un .xlsx por profesional regenerando solo los que cambiaron
+
+        El estado de la agregación (conteos y días por clave, y la huella de las filas ya
+        consumidas) se guarda en ruta_estado. En cada llamada se incorporan solo las filas
+        nuevas o modificadas respecto al estado; sin estado se hace el cálculo completo.
+
+        Args:
+            conglomerado_path: Ruta (o archivo) del Excel con la hoja CONGLOMERADO
+            output_dir (str): Carpeta de salida (se crea si no existe)
+            ruta_estado (str): Archivo donde se persiste el estado de la agregación
+            verificar (bool): Si es True recalcula todo desde cero y compara con el estado
+
+        Returns:
+            dict: regenerados y eliminados (nombres de profesionales), filas_nuevas y filas_eliminadas
+        """
+        from agregacion_incremental import EstadoAgregacion
+
+        df_filtered = self._leer_conglomerado(conglomerado_path)
+        with self._etapa("agregacion"):
+            estado = EstadoAgregacion.cargar(ruta_estado)
+            completo = estado.vacio
+            cambios = estado.actualizar(df_filtered)
+            df_agrupado = estado.agrupado()
+
+        if verificar:
+            try:
+                pd.testing.assert_frame_equal(df_agrupado, self._agrupar_sesiones(df_filtered),
+                                              check_dtype=False, check_categorical=False)
+            except AssertionError as e:
+                raise ValueError(f"El estado incremental no coincide con el cálculo completo: {e}")
+        self._contar(grupos=len(df_agrupado))
+
+        # Los nombres de archivo se asignan sobre todos los profesionales, igual que en exportar_en_paralelo
+        os.makedirs(output_dir, exist_ok=True)
+        grupos = dict(list(df_agrupado.groupby("NOMBRE DEL PROFESIONAL", sort=True)))
+        usados = set()
+        archivos = {
+            nombre_profesional: _nombre_unico(nombre_archivo_cuadro(nombre_profesional), usados)
+            for nombre_profesional in grupos
+        }
 
-        df_grouped["Valor"] = df_grouped["NO de sesiones"] * 4500
-        df_grouped["Fecha Inicial"] = ""
-        df_grouped["Fecha Final"] = ""
+        regenerados = []
+        for nombre_profesional, df_profesional in grupos.items():
+            nombre_archivo = archivos[nombre_profesional]
+            ruta = os.path.join(output_dir, nombre_archivo)
+            if (completo or nombre_profesional in cambios["profesionales"]
+                    or estado.archivos.get(nombre_profesional) != nombre_archivo or not os.path.exists(ruta)):
+                self._escribir_cuadro(self._construir_cuadro(df_profesional.reset_index(drop=True)), ruta)
+                regenerados.append(nombre_profesional)
+
+        eliminados = []
+        for nombre_profesional, nombre_archivo in estado.archivos.items():
+            if nombre_archivo not in archivos.values():
+                ruta = os.path.join(output_dir, nombre_archivo)
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            if nombre_profesional not in archivos:
+                eliminados.append(nombre_profesional)
+
+        estado.archivos = archivos
+        estado.guardar(ruta_estado)
+
+        return {
+            "regenerados": regenerados,
+            "eliminados": eliminados,
+            "filas_nuevas": cambios["filas_nuevas"],
+            "filas_eliminadas": cambios["filas_eliminadas"],
+        }
 
-        df_grouped.to_excel(output_path, sheet_name="CUADRO SESIONES REALIZADAS", index=False, engine="openpyxl")
+    @_instrumentado
+    def generar_combinado(self, conglomerados, output_path=None, tamano_bloque=50000, limite_mb=256):
+        """
+        Genera un solo cuadro a partir de varios conglomerados, con memoria acotada
+
+        Cada archivo se lee por bloques y se acumula en un AgregadoClaves, que se vuelca a
+        disco cuando supera limite_mb. El resultado es el mismo que agrupar en memoria los
+        archivos concatenados en el orden recibido.
+
+        Args:
+            conglomerados (list): Rutas, bytes o archivos de los Excel con la hoja CONGLOMERADO
+            output_path: Ruta (o archivo) de salida; None devuelve un BytesIO
+            tamano_bloque (int): Filas por bloque de lectura
+            limite_mb (float): Memoria estimada del agregado antes de volcar a disco
+
+        Returns:
+            io.BytesIO | None: El libro si output_path es None
+        """
+        from agregacion_bloques import AgregadoClaves
+
+        agregado = AgregadoClaves(int(limite_mb * 1024 * 1024))
+        try:
+            for conglomerado in conglomerados:
+                bloques = iterar_conglomerado(conglomerado, tamano_bloque)
+                while True:
+                    with self._etapa("lectura"):
+                        bloque = next(bloques, None)
+                    if bloque is None:
+                        break
+                    with self._etapa("agregacion"):
+                        agregado.agregar(bloque)
+
+            salida = io.BytesIO() if output_path is None else output_path
+            wb = Workbook(write_only=True)
+            ws = _agregar_hoja(wb, HOJA_CUADRO, self._construir_cuadro(pd.DataFrame(columns=COLUMNAS_AGRUPADAS)))
+            filas = agregado.iterar_filas()
+            grupos = 0
+            while True:
+                with self._etapa("agregacion"):
+                    lote = list(itertools.islice(filas, 10000))
+                if not lote:
+                    break
+                grupos += len(lote)
+                with self._etapa("escritura"):
+                    _agregar_filas(ws, self._construir_cuadro(pd.DataFrame(lote, columns=COLUMNAS_AGRUPADAS)))
+            with self._etapa("escritura"):
+                wb.save(salida)
+        finally:
+            agregado.cerrar()
+
+        self._contar(filas=agregado.filas, grupos=grupos, archivos=len(conglomerados),
+                     volcados=agregado.volcados, reparticiones=agregado.reparticiones)
+        if output_path is None:
+            salida.seek(0)
+            return salida
+
+
+def _escribir_cuadro_worker(df_grouped, ruta):
+    # Se ejecuta en el proceso worker: devuelve el pid y lo que tardó la escritura
+    inicio = time.perf_counter()
+    CuadroFacturacionGenerator()._escribir_cuadro(df_grouped, ruta)
+    return os.getpid(), time.perf_counter() - inicio
@@ -0,0 +1,245 @@
+"""
+Agregación por clave acotada en memoria, para combinar varios conglomerados
+Los bloques de filas se acumulan en conteos y días por clave; si el agregado supera el límite de
+memoria se vuelca a disco en particiones por hash de la clave, que al final se combinan una a una
+(las que al combinarlas superan el límite se vuelven a partir) y se intercalan por pasadas
+"""
+
+import heapq
+import os
+import pickle
+import tempfile
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from CuadroFacturacionGenerator import COLUMNAS_AGRUPADAS, COLUMNAS_CLAVE, codigos_clave, formatear_dias
+
+# Tamaño estimado en memoria de una clave con sus valores y de cada día distinto en su Counter
+BYTES_POR_CLAVE = 600
+BYTES_POR_DIA = 100
+
+# Orden de COLUMNAS_AGRUPADAS[:8] dentro de una clave (que sigue el orden de COLUMNAS_CLAVE)
+_ORDEN_SALIDA = [COLUMNAS_CLAVE.index(c) for c in COLUMNAS_AGRUPADAS[:8]]
+
+# Filas por lote en los archivos finales: el intercalado tiene un lote abierto por archivo
+FILAS_POR_LOTE_DISCO = 1000
+
+# Veces que una partición puede volver a partirse (cada nivel divide por `particiones`)
+MAX_NIVELES = 4
+
+# Archivos finales que se intercalan a la vez; si hay más, se intercalan por pasadas
+MAX_ARCHIVOS_ABIERTOS = 64
+
+
+def _normalizar(valor):
+    # NaN/NaT no son iguales a sí mismos: como en groupby(dropna=False) todos los vacíos van juntos
+    return None if pd.isna(valor) else valor
+
+
+def _volcar(ruta, registros):
+    with open(ruta, "ab") as f:
+        pickle.dump(registros, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _leer_volcados(ruta):
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+class AgregadoClaves:
+    """
+    Conteos y días de atención por clave de 8 campos, combinables entre bloques y archivos
+
+    Args:
+        limite_bytes (int): Memoria estimada a partir de la cual el agregado se vuelca a disco
+        particiones (int): Archivos en que se reparte lo volcado (cada uno se combina por separado)
+        directorio (str, optional): Carpeta temporal para los volcados
+
+    Attributes:
+        filas (int): Filas consumidas
+        volcados (int): Veces que el agregado se volcó a disco
+        reparticiones (int): Particiones que superaban el límite y se volvieron a partir
+    """
+
+    def __init__(self, limite_bytes=256 * 1024 * 1024, particiones=16, directorio=None):
+        self.limite_bytes = limite_bytes
+        self.particiones = particiones
+        self.filas = 0
+        self.volcados = 0
+        self.reparticiones = 0
+        # clave -> [posición global de su primera fila, Counter de días]
+        self._claves = {}
+        self._bytes = 0
+        self._temporal = tempfile.TemporaryDirectory(prefix="agregado_", dir=directorio)
+
+    def agregar(self, df):
+        """
+        Incorpora un bloque de filas
+
+        Args:
+            df (pandas.DataFrame): Bloque con las columnas de COLUMNAS_CLAVE y FECHA ATENCION
+        """
+        if df.empty:
+            return
+        fechas = pd.to_datetime(df["FECHA ATENCION"])
+        if fechas.isna().any():
+            raise ValueError("Hay registros sin FECHA ATENCION")
+
+        codigos = codigos_clave(df)
+        dias = fechas.to_numpy().astype("datetime64[D]").astype(np.int64)
+        orden = np.lexsort((dias, codigos))
+        tramos = np.split(dias[orden], np.flatnonzero(np.diff(codigos[orden])) + 1)
+        _, primeras = np.unique(codigos, return_index=True)
+
+        claves = df.iloc[primeras][COLUMNAS_CLAVE].itertuples(index=False, name=None)
+        for clave, primera, tramo in zip(claves, (primeras + self.filas).tolist(), tramos):
+            clave = tuple(_normalizar(v) for v in clave)
+            entrada = self._claves.get(clave)
+            if entrada is None:
+                entrada = self._claves[clave] = [primera, Counter()]
+                self._bytes += BYTES_POR_CLAVE
+            antes = len(entrada[1])
+            entrada[1].update(tramo.tolist())
+            self._bytes += (len(entrada[1]) - antes) * BYTES_POR_DIA
+
+        self.filas += len(df)
+        if self._bytes > self.limite_bytes:
+            self._volcar()
+
+    def _ruta(self, particion):
+        return os.path.join(self._temporal.name, f"parcial_{particion}.pkl")
+
+    def _volcar(self):
+        por_particion = [[] for _ in range(self.particiones)]
+        for clave, (primera, dias) in self._claves.items():
+            por_particion[hash(clave) % self.particiones].append((clave, primera, dict(dias)))
+        for particion, registros in enumerate(por_particion):
+            if registros:
+                _volcar(self._ruta(particion), registros)
+        self._claves = {}
+        self._bytes = 0
+        self.volcados += 1
+
+    @staticmethod
+    def _fila(clave, primera, dias):
+        dias_ordenados = tuple(sorted(Counter(dias).elements()))
+        valores = tuple(clave[i] for i in _ORDEN_SALIDA)
+        return primera, valores + (len(dias_ordenados), formatear_dias(dias_ordenados))
+
+    def iterar_filas(self):
+        """
+        Recorre el resultado en el orden de primera aparición de cada clave
+
+        Sin volcados se ordena en memoria; con volcados se combina cada partición por
+        separado, se guarda ordenada y las particiones se intercalan con heapq.merge.
+        Si al combinar una partición sus claves distintas superan limite_bytes, se descarta
+        lo combinado y se vuelve a partir por otro hash. El intercalado abre a lo sumo
+        MAX_ARCHIVOS_ABIERTOS archivos: si hay más, se intercalan por grupos en pasadas.
+
+        Yields:
+            tuple: Valores de COLUMNAS_AGRUPADAS (8 campos, sesiones y fechas formateadas)
+        """
+        if not self.volcados:
+            entradas = sorted(self._claves.items(), key=lambda item: item[1][0])
+            for clave, (primera, dias) in entradas:
+                yield self._fila(clave, primera, dias)[1]
+            return
+
+        if self._claves:
+            self._volcar()
+
+        finales = []
+        for particion in range(self.particiones):
+            self._combinar(str(particion), 1, finales)
+
+        pasada = 0
+        while len(finales) > MAX_ARCHIVOS_ABIERTOS:
+            pasada += 1
+            grupos = [finales[i:i + MAX_ARCHIVOS_ABIERTOS] for i in range(0, len(finales), MAX_ARCHIVOS_ABIERTOS)]
+            finales = [self._intercalar_en_disco(grupo, f"pasada{pasada}_{n}") for n, grupo in enumerate(grupos)]
+
+        for _, fila in self._intercalar(finales):
+            yield fila
+
+    @staticmethod
+    def _intercalar(rutas):
+        return heapq.merge(*(_leer_volcados(ruta) for ruta in rutas), key=lambda fila: fila[0])
+
+    def _intercalar_en_disco(self, rutas, nombre):
+        # Intercala un grupo de archivos finales en uno solo, sin cargarlos completos
+        final = os.path.join(self._temporal.name, f"final_{nombre}.pkl")
+        lote = []
+        for fila in self._intercalar(rutas):
+            lote.append(fila)
+            if len(lote) >= FILAS_POR_LOTE_DISCO:
+                _volcar(final, lote)
+                lote = []
+        if lote:
+            _volcar(final, lote)
+        for ruta in rutas:
+            os.remove(ruta)
+        return final
+
+    def _combinar(self, particion, nivel, finales):
+        # Combina una partición volcada en un archivo final ordenado; si sus claves distintas
+        # no caben en limite_bytes la vuelve a partir (el tamaño se mide al combinar, así las
+        # claves repetidas entre volcados cuentan una sola vez)
+        ruta = self._ruta(particion)
+        if not os.path.exists(ruta):
+            return
+
+        combinado = {}
+        estimado = 0
+        for clave, primera, dias in _leer_volcados(ruta):
+            entrada = combinado.get(clave)
+            if entrada is None:
+                entrada = combinado[clave] = [primera, Counter()]
+                estimado += BYTES_POR_CLAVE
+            else:
+                entrada[0] = min(entrada[0], primera)
+            antes = len(entrada[1])
+            entrada[1].update(dias)
+            estimado += (len(entrada[1]) - antes) * BYTES_POR_DIA
+            if estimado > self.limite_bytes and nivel <= MAX_NIVELES:
+                break
+        else:
+            os.remove(ruta)
+            filas = sorted(self._fila(clave, primera, dias) for clave, (primera, dias) in combinado.items())
+            final = os.path.join(self._temporal.name, f"final_{particion}.pkl")
+            for inicio in range(0, len(filas), FILAS_POR_LOTE_DISCO):
+                _volcar(final, filas[inicio:inicio + FILAS_POR_LOTE_DISCO])
+            finales.append(final)
+            return
+
+        combinado = None
+        self._repartir(particion, nivel)
+        for sub in range(self.particiones):
+            self._combinar(f"{particion}_{sub}", nivel + 1, finales)
+
+    def _repartir(self, particion, nivel):
+        # Reparte los registros de una partición en sub-particiones por otro hash de la clave
+        self.reparticiones += 1
+        ruta = self._ruta(particion)
+        lotes = [[] for _ in range(self.particiones)]
+        for registro in _leer_volcados(ruta):
+            sub = hash((nivel, registro[0])) % self.particiones
+            lotes[sub].append(registro)
+            if len(lotes[sub]) >= FILAS_POR_LOTE_DISCO:
+                _volcar(self._ruta(f"{particion}_{sub}"), lotes[sub])
+                lotes[sub] = []
+        for sub, registros in enumerate(lotes):
+            if registros:
+                _volcar(self._ruta(f"{particion}_{sub}"), registros)
+        os.remove(ruta)
+
+    def cerrar(self):
+        """Borra los volcados en disco"""
+        self._temporal.cleanup()
@@ -0,0 +1,177 @@
+"""
+Estado persistente de la agregación por clave para regenerar cuadros de forma incremental
+Cuando se vuelve a subir un conglomerado con filas agregadas, solo se incorporan las filas
+nuevas (o modificadas) y solo se regeneran los profesionales cuyos grupos cambiaron
+"""
+
+import os
+import pickle
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from CuadroFacturacionGenerator import COLUMNAS_AGRUPADAS, COLUMNAS_CLAVE, formatear_dias
+from ingesta_conglomerado import COLUMNAS_CONGLOMERADO
+
+# Se incrementa cuando cambia el formato del estado para descartar los anteriores
+VERSION_ESTADO = 1
+
+# Posición del nombre del profesional dentro de los valores de la clave
+_INDICE_PROFESIONAL = COLUMNAS_AGRUPADAS.index("NOMBRE DEL PROFESIONAL")
+
+
+def _huellas(df, columnas):
+    # Hash de 64 bits por fila sobre las columnas indicadas (incluye NaN/NaT de forma estable)
+    return pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+
+
+class EstadoAgregacion:
+    """
+    Agregación por la clave de 8 campos junto con la huella de las filas consumidas
+
+    Attributes:
+        filas (pandas.DataFrame): Por huella de fila: cuenta, clave y día de atención
+        claves (dict): Por huella de clave: [valores de la clave, Counter de días, texto o None]
+        orden (numpy.ndarray): Huellas de clave en orden de primera aparición
+        archivos (dict): Nombre de archivo asignado a cada profesional
+    """
+
+    def __init__(self):
+        self.filas = pd.DataFrame(
+            {"cuenta": np.array([], dtype=np.int64),
+             "clave": np.array([], dtype=np.uint64),
+             "dia": np.array([], dtype=np.int64)},
+            index=pd.Index(np.array([], dtype=np.uint64), name="huella")
+        )
+        self.claves = {}
+        self.orden = np.array([], dtype=np.uint64)
+        self.archivos = {}
+        self._agrupado = None
+
+    @property
+    def vacio(self):
+        return not self.claves
+
+    def actualizar(self, df):
+        """
+        Incorpora la diferencia entre las filas consumidas y las de df
+
+        Args:
+            df (pandas.DataFrame): Conglomerado completo (columnas de COLUMNAS_CONGLOMERADO)
+
+        Returns:
+            dict: profesionales (set) cuyos grupos cambiaron, filas_nuevas y filas_eliminadas
+        """
+        fechas = pd.to_datetime(df["FECHA ATENCION"])
+        if fechas.isna().any():
+            raise ValueError("Hay registros sin FECHA ATENCION")
+
+        huellas = _huellas(df, COLUMNAS_CONGLOMERADO)
+        huellas_clave = _huellas(df, COLUMNAS_CLAVE)
+        dias = fechas.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        # Multiconjunto de filas nuevas contra el consumido: > 0 agregadas, < 0 eliminadas
+        filas_nuevas = pd.DataFrame(
+            {"clave": huellas_clave, "dia": dias, "posicion": np.arange(len(df))},
+            index=pd.Index(huellas, name="huella")
+        )
+        unicas = filas_nuevas[~filas_nuevas.index.duplicated()]
+        unicas = unicas.assign(cuenta=filas_nuevas.index.value_counts().reindex(unicas.index).to_numpy())
+        diferencia = unicas["cuenta"].sub(self.filas["cuenta"], fill_value=0)
+        diferencia = diferencia[diferencia != 0].astype(np.int64)
+
+        agregadas = unicas.loc[diferencia.index[diferencia > 0]]
+        eliminadas = self.filas.loc[diferencia.index[diferencia < 0]]
+        movimientos = pd.concat([
+            pd.DataFrame({"clave": agregadas["clave"].to_numpy(), "dia": agregadas["dia"].to_numpy(),
+                          "delta": diferencia.loc[agregadas.index].to_numpy()}),
+            pd.DataFrame({"clave": eliminadas["clave"].to_numpy(), "dia": eliminadas["dia"].to_numpy(),
+                          "delta": diferencia.loc[eliminadas.index].to_numpy()}),
+        ])
+        movimientos = movimientos.groupby(["clave", "dia"], sort=False)["delta"].sum()
+
+        # Valores de las claves que aparecen por primera vez
+        claves_nuevas = agregadas.drop_duplicates("clave")
+        claves_nuevas = claves_nuevas[~claves_nuevas["clave"].isin(list(self.claves))]
+        valores_nuevos = df.iloc[claves_nuevas["posicion"].to_numpy()][COLUMNAS_AGRUPADAS[:8]]
+        for clave, valores in zip(claves_nuevas["clave"].tolist(), valores_nuevos.itertuples(index=False, name=None)):
+            self.claves[clave] = [valores, Counter(), None]
+
+        cambiados = set()
+        for (clave, dia), delta in zip(movimientos.index.tolist(), movimientos.tolist()):
+            entrada = self.claves[clave]
+            entrada[1][dia] += delta
+            if entrada[1][dia] <= 0:
+                del entrada[1][dia]
+            entrada[2] = None
+            cambiados.add(clave)
+
+        profesionales = set()
+        for clave in cambiados:
+            profesionales.add(self.claves[clave][0][_INDICE_PROFESIONAL])
+            if not self.claves[clave][1]:
+                del self.claves[clave]
+
+        self.filas = unicas[["cuenta", "clave", "dia"]]
+        self.orden = pd.unique(huellas_clave)
+        self._agrupado = None
+
+        return {
+            "profesionales": profesionales,
+            "filas_nuevas": int(diferencia[diferencia > 0].sum()),
+            "filas_eliminadas": int(-diferencia[diferencia < 0].sum()),
+        }
+
+    def agrupado(self):
+        """
+        Returns:
+            pandas.DataFrame: Igual que CuadroFacturacionGenerator._agrupar_sesiones sobre el
+                conglomerado completo, armado desde el estado (los textos se recalculan solo
+                para las claves que cambiaron)
+        """
+        if self._agrupado is not None:
+            return self._agrupado
+
+        registros = []
+        for clave in self.orden.tolist():
+            entrada = self.claves[clave]
+            if entrada[2] is None:
+                entrada[2] = formatear_dias(tuple(sorted(entrada[1].elements())))
+            registros.append(entrada[0] + (sum(entrada[1].values()), entrada[2]))
+
+        self._agrupado = pd.DataFrame.from_records(registros, columns=COLUMNAS_AGRUPADAS)
+        self._agrupado["NO de sesiones"] = self._agrupado["NO de sesiones"].astype(np.int64)
+        return self._agrupado
+
+    def guardar(self, ruta):
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            pickle.dump((VERSION_ESTADO, self.filas, self.claves, self.orden, self.archivos), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Lee un estado guardado; si no existe o es de otra versión devuelve uno vacío
+
+        Args:
+            ruta (str): Archivo del estado
+
+        Returns:
+            EstadoAgregacion: Estado leído o vacío (que obliga a un cálculo completo)
+        """
+        estado = cls()
+        if not os.path.exists(ruta):
+            return estado
+        try:
+            with open(ruta, "rb") as f:
+                version, filas, claves, orden, archivos = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as e:
+            print(f"Estado de agregación ignorado: {str(e)}")
+            return estado
+        if version != VERSION_ESTADO:
+            return estado
+        estado.filas, estado.claves, estado.orden, estado.archivos = filas, claves, orden, archivos
+        return estado
@@ -1,68 +1,216 @@
 import streamlit as st
-import pandas as pd
-import tempfile
-import os
-from CuadroFacturacionGenerator import CuadroFacturacionGenerator
+import io
+
+from dotenv import load_dotenv
+
+# Antes de importar los módulos del proyecto: varios leen su configuración del .env al importarse
+load_dotenv()
+
+from CuadroFacturacionGenerator import CuadroFacturacionGenerator, nombre_archivo_cuadro
 import auditoria_manager
+from cache_conglomerado import cache_conglomerado
+from cola_trabajos import EN_COLA, ERROR, ColaLlena, cola_generacion
 
 st.set_page_config(page_title="Generador de Cuadro de Facturación", layout="centered")
 
 st.title("🧾 Generador de Cuadro de Facturación")
 st.markdown("Sube el archivo de Excel con el conglomerado, selecciona un profesional y descarga el archivo generado.")
 
+
+def mostrar_metricas(metricas):
+    """Tiempos por etapa de la última generación, para adjuntar a reportes de lentitud"""
+    if metricas is None:
+        return
+    with st.expander("⏱️ Tiempos de generación"):
+        st.table([
+            {
+                "Etapa": etapa,
+                "Segundos": round(medida["segundos"], 3),
+                "Llamadas": medida["llamadas"],
+                "Memoria (MB)": None if medida["memoria_mb"] is None else round(medida["memoria_mb"], 1),
+            }
+            for etapa, medida in metricas.etapas.items()
+        ])
+        st.code(metricas.resumen(), language=None)
+
+
+def trabajo_un_profesional(contenido, nombre):
+    """Trabajo para la cola: cuadro de un profesional"""
+    def generar(trabajo):
+        generador = CuadroFacturacionGenerator(cache=cache_conglomerado, progreso=trabajo.avance)
+        salida = generador.generar_filtrado_por_profesional(contenido, None, [nombre])
+        trabajo.metricas = generador.ultimas_metricas
+        return salida.getvalue()
+    return generar
+
+
+def trabajo_todos(contenido, formato):
+    """Trabajo para la cola: cuadros de todos los profesionales en ZIP o libro"""
+    def generar(trabajo):
+        generador = CuadroFacturacionGenerator(cache=cache_conglomerado, progreso=trabajo.avance)
+        salida = io.BytesIO()
+        generador.generar_todos_por_profesional(contenido, salida, formato)
+        trabajo.metricas = generador.ultimas_metricas
+        return salida.getvalue()
+    return generar
+
+
+def enviar_generacion(clave, funcion):
+    """
+    Encola la generación salvo que el archivo ya esté listo
+
+    Returns:
+        bool: False si la cola está llena
+    """
+    if cola_generacion.resultado(clave) is not None:
+        return True
+    try:
+        cola_generacion.enviar(clave, funcion)
+        return True
+    except ColaLlena as e:
+        st.warning(f"⚠️ {e}")
+        return False
+
+
+@st.fragment(run_every=1.0)
+def seguir_trabajo(clave):
+    """Barra de progreso que se refresca sola; al terminar el trabajo recarga la página"""
+    trabajo = cola_generacion.obtener(clave)
+    if trabajo is None or not trabajo.activo:
+        st.rerun()
+    if trabajo.estado == EN_COLA:
+        texto = f"⏳ En cola ({cola_generacion.en_espera(trabajo)} trabajos antes)..."
+    else:
+        texto = f"⏳ Generando ({trabajo.etapa or 'inicio'})..."
+    st.progress(trabajo.progreso, text=texto)
+
+
+def resultado_generacion(clave, generados_sesion, metricas_sesion):
+    """
+    Devuelve el archivo si ya está generado; si no, muestra el progreso o el error
+
+    Returns:
+        bytes | None: Contenido del archivo
+    """
+    trabajo = cola_generacion.obtener(clave)
+    if trabajo is not None and trabajo.metricas is not None:
+        metricas_sesion[clave] = trabajo.metricas
+
+    archivo_bytes = cola_generacion.resultado(clave)
+    if archivo_bytes is not None:
+        return archivo_bytes
+
+    if trabajo is not None and trabajo.activo:
+        seguir_trabajo(clave)
+    elif trabajo is not None and trabajo.estado == ERROR:
+        st.error(f"❌ Error al generar el archivo: {trabajo.error}")
+        generados_sesion.discard(clave)
+    else:
+        st.info("ℹ️ El archivo generado ya no está disponible, vuelve a generarlo.")
+        generados_sesion.discard(clave)
+    return None
+
+
 uploaded_file = st.file_uploader("📤 Cargar archivo Excel (.xlsx)", type=["xlsx"])
 
 if uploaded_file:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as temp_input:
-        temp_input.write(uploaded_file.read())
-        temp_input_path = temp_input.name
-
     try:
-        df_preview = pd.read_excel(temp_input_path, sheet_name="CONGLOMERADO", engine="openpyxl")
-        nombres_profesionales = sorted(df_preview["NOMBRE DEL PROFESIONAL"].dropna().unique())
+        # El archivo se parsea una sola vez por contenido; los reruns lo toman de la caché
+        conglomerado = cache_conglomerado.obtener_conglomerado(uploaded_file)
+        df_preview = conglomerado.df
+        nombres_profesionales = conglomerado.profesionales
 
         #Registrar carga del archivo
         auditoria_manager.registrar_carga_archivo(
             uploaded_file.name,
             len(nombres_profesionales),
-            nombres_profesionales
+            nombres_profesionales,
+            hash_archivo=conglomerado.hash_archivo
         )
 
-        nombre_seleccionado = st.selectbox("👤 Selecciona el profesional:", nombres_profesionales)
+        # Archivos generados en esta sesión: su botón de descarga se mantiene entre reruns
+        generados_sesion = st.session_state.setdefault("generados", set())
+        metricas_sesion = st.session_state.setdefault("metricas", {})
 
-        if nombre_seleccionado and st.button("🚀 Generar archivo"):
-            generador = CuadroFacturacionGenerator()
+        modo = st.radio("📋 ¿Qué deseas generar?", ["Un profesional", "Todos los profesionales"], horizontal=True)
 
-            with st.spinner("⏳ Generando archivo, por favor espera..."):
-                temp_output = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{nombre_seleccionado.replace(' ', '_')}.xlsx")
-                temp_output_path = temp_output.name
-                temp_output.close()
+        if modo == "Todos los profesionales":
+            formato = st.selectbox(
+                "📦 Formato de salida:",
+                ["zip", "libro"],
+                format_func=lambda f: "ZIP con un archivo por profesional" if f == "zip" else "Un libro con una hoja por profesional"
+            )
+            extension = ".zip" if formato == "zip" else ".xlsx"
+            nombre_archivo = f"CUADROS_PROFESIONALES{extension}"
+            clave_resultado = (conglomerado.hash_archivo, "TODOS", formato)
 
-                generador.generar_filtrado_por_profesional(temp_input_path, temp_output_path, [nombre_seleccionado])
+            if st.button("🚀 Generar todos") and enviar_generacion(
+                clave_resultado, trabajo_todos(uploaded_file.getvalue(), formato)
+            ):
+                auditoria_manager.registrar_descarga(
+                    nombre_profesional="TODOS",
+                    nombre_archivo=nombre_archivo,
+                    info_adicional={
+                        "archivo_origen": uploaded_file.name,
+                        "num_registros": len(df_preview),
+                        "num_profesionales": len(nombres_profesionales),
+                        "formato": formato
+                    }
+                )
+                generados_sesion.add(clave_resultado)
 
-            # Registrar ANTES de mostrar el botón de descarga
-            auditoria_manager.registrar_descarga(
-                nombre_profesional=nombre_seleccionado,
-                nombre_archivo="",
-                info_adicional={
-                    "archivo_origen": uploaded_file.name,
-                    "num_registros": len(df_preview)
-                }
+            archivo_bytes = None
+            if clave_resultado in generados_sesion:
+                archivo_bytes = resultado_generacion(clave_resultado, generados_sesion, metricas_sesion)
+            if archivo_bytes is not None:
+                st.success(f"✅ Se generaron {len(nombres_profesionales)} cuadros. Descárgalos a continuación:")
+                st.download_button(
+                    label="📥 Descargar todos",
+                    data=archivo_bytes,
+                    file_name=nombre_archivo,
+                    mime="application/zip" if formato == "zip" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="download_todos"
+                )
+                mostrar_metricas(metricas_sesion.get(clave_resultado))
+
+        nombre_seleccionado = None
+        if modo == "Un profesional":
+            nombre_seleccionado = st.selectbox(
+                "👤 Selecciona el profesional:",
+                nombres_profesionales,
+                format_func=conglomerado.indice.etiqueta
             )
-            st.success("✅ Archivo generado. Descárgalo a continuación:")
 
-            with open(temp_output_path, "rb") as f:
-                archivo_bytes = f.read()
+        if nombre_seleccionado:
+            clave_resultado = (conglomerado.hash_archivo, nombre_seleccionado)
+
+            if st.button("🚀 Generar archivo") and enviar_generacion(
+                clave_resultado, trabajo_un_profesional(uploaded_file.getvalue(), nombre_seleccionado)
+            ):
+                # Registrar ANTES de mostrar el botón de descarga
+                auditoria_manager.registrar_descarga(
+                    nombre_profesional=nombre_seleccionado,
+                    nombre_archivo="",
+                    info_adicional={
+                        "archivo_origen": uploaded_file.name,
+                        "num_registros": len(df_preview)
+                    }
+                )
+                generados_sesion.add(clave_resultado)
 
+            archivo_bytes = None
+            if clave_resultado in generados_sesion:
+                archivo_bytes = resultado_generacion(clave_resultado, generados_sesion, metricas_sesion)
+            if archivo_bytes is not None:
+                st.success("✅ Archivo generado. Descárgalo a continuación:")
                 st.download_button(
                     label=f"📥 Descargar {nombre_seleccionado}",
-                    data=f,
-                    file_name=f"CUADRO_{nombre_seleccionado.replace(' ', '_')}.xlsx",
+                    data=archivo_bytes,
+                    file_name=nombre_archivo_cuadro(nombre_seleccionado),
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     key=f"download_{nombre_seleccionado}"
                 )
+                mostrar_metricas(metricas_sesion.get(clave_resultado))
 
     except Exception as e:
         st.error(f"❌ Error al procesar el archivo: {e}")
-    finally:
-        os.remove(temp_input_path)
@@ -0,0 +1,119 @@
+"""
+Cliente local en memoria con la misma API de tablas que usa auditoria_manager con Supabase
+Sirve para probar el sistema de auditoría sin red: auditoria_manager.configurar_cliente(ClienteAuditoriaMemoria())
+"""
+
+import copy
+import threading
+from collections import defaultdict
+
+
+class RespuestaLocal:
+    """Equivalente a la respuesta de supabase: .data y .count"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class ConsultaLocal:
+    """Constructor de consultas encadenables sobre una tabla en memoria"""
+
+    def __init__(self, cliente, tabla):
+        self._cliente = cliente
+        self._tabla = tabla
+        self._insertar = None
+        self._on_conflict = None
+        self._columnas = None
+        self._contar = False
+        self._filtros = []
+        self._orden = []
+        self._limite = None
+
+    def insert(self, registros):
+        self._insertar = registros if isinstance(registros, list) else [registros]
+        return self
+
+    def upsert(self, registros, on_conflict=None):
+        self.insert(registros)
+        self._on_conflict = on_conflict
+        return self
+
+    def select(self, columnas="*", count=None):
+        self._columnas = None if columnas.strip() == "*" else [c.strip() for c in columnas.split(",")]
+        self._contar = count == "exact"
+        return self
+
+    def eq(self, columna, valor):
+        self._filtros.append(lambda r: r.get(columna) == valor)
+        return self
+
+    def lt(self, columna, valor):
+        self._filtros.append(lambda r: r.get(columna) is not None and r.get(columna) < valor)
+        return self
+
+    def gt(self, columna, valor):
+        self._filtros.append(lambda r: r.get(columna) is not None and r.get(columna) > valor)
+        return self
+
+    def order(self, columna, desc=False):
+        self._orden.append((columna, desc))
+        return self
+
+    def limit(self, cantidad):
+        self._limite = cantidad
+        return self
+
+    def execute(self):
+        return self._cliente._ejecutar(self)
+
+
+class ClienteAuditoriaMemoria:
+    """
+    Cliente en memoria compatible con supabase.table(...)
+
+    Attributes:
+        tablas (dict): Filas guardadas por tabla
+        disponible (bool): En False todas las consultas fallan como si no hubiera red
+        llamadas (int): Número de consultas ejecutadas
+    """
+
+    def __init__(self):
+        self.tablas = defaultdict(list)
+        self.disponible = True
+        self.llamadas = 0
+        self._lock = threading.Lock()
+        self._siguiente_id = 1
+
+    def table(self, nombre):
+        return ConsultaLocal(self, nombre)
+
+    def _ejecutar(self, consulta):
+        with self._lock:
+            self.llamadas += 1
+            if not self.disponible:
+                raise ConnectionError("Backend de auditoría no disponible")
+
+            filas = self.tablas[consulta._tabla]
+            if consulta._insertar is not None:
+                insertados = []
+                for registro in consulta._insertar:
+                    if consulta._on_conflict:
+                        clave = registro.get(consulta._on_conflict)
+                        filas[:] = [f for f in filas if f.get(consulta._on_conflict) != clave]
+                    fila = copy.deepcopy(registro)
+                    fila.setdefault("id", self._siguiente_id)
+                    self._siguiente_id += 1
+                    filas.append(fila)
+                    insertados.append(copy.deepcopy(fila))
+                return RespuestaLocal(insertados)
+
+            resultado = [f for f in filas if all(filtro(f) for filtro in consulta._filtros)]
+            total = len(resultado)
+            for columna, desc in reversed(consulta._orden):
+                resultado.sort(key=lambda f: (f.get(columna) is None, f.get(columna)), reverse=desc)
+            if consulta._limite is not None:
+                resultado = resultado[:consulta._limite]
+            if consulta._columnas is not None:
+                resultado = [{c: f.get(c) for c in consulta._columnas} for f in resultado]
+            return RespuestaLocal(copy.deepcopy(resultado), total if consulta._contar else None)
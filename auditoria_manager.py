@@ -5,43 +5,426 @@ Maneja toda la lógica de conexión con Supabase y captura de información del u
 
 import streamlit as st
 from datetime import datetime
-from supabase import create_client, Client
 import socket
 import platform
 import os 
-from dotenv import load_dotenv
+import json
+import queue
+import threading
+import time
+import atexit
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from conexion_auditoria import BackendNoDisponible, ConexionPerezosa, Cortocircuito
+from resumen_descargas import ResumenDescargas
 
 # ===========================
 # CONFIGURACIÓN DE SUPABASE
 # ===========================
 
-# Cargar variables de entorno desde archivo .env
-load_dotenv()
+# Segundos máximos por petición HTTP y tiempo que una consulta espera a que termine la conexión
+TIMEOUT_AUDITORIA = float(os.getenv("AUDITORIA_TIMEOUT", "10"))
 
-# Intentar obtener credenciales desde múltiples fuentes
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Tras esta cantidad de fallos seguidos no se llama al backend durante AUDITORIA_CORTE_SEGUNDOS
+CORTE_FALLOS = int(os.getenv("AUDITORIA_CORTE_FALLOS", "3"))
+CORTE_SEGUNDOS = float(os.getenv("AUDITORIA_CORTE_SEGUNDOS", "30"))
 
-# Si no están en .env, intentar con Streamlit secrets (solo en deployment)
-if not SUPABASE_URL or not SUPABASE_KEY:
-    try:
-        SUPABASE_URL = st.secrets["SUPABASE_URL"]
-        SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-    except (KeyError, FileNotFoundError, AttributeError):
-        # No hay secrets configurados, esto es normal en desarrollo local
-        pass
-
-# Validar que existan las credenciales
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("⚠️ No se encontraron credenciales de Supabase. Sistema de auditoría deshabilitado.")
-    supabase = None
-else:
-    try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("✅ Conexión con Supabase establecida")
-    except Exception as e:
-        print(f"❌ Error al conectar con Supabase: {e}")
-        supabase = None
+
+@lru_cache(maxsize=1)
+def _credenciales():
+    """
+    Busca las credenciales de Supabase (solo la primera vez que se necesitan)
+
+    Returns:
+        tuple | None: (url, key), o None si no hay credenciales
+    """
+    # Cargar variables de entorno desde archivo .env (app.py y los CLI ya lo cargan al arrancar,
+    # antes de importar los módulos que leen su configuración; esto cubre otros usos)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # Intentar obtener credenciales desde múltiples fuentes
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+
+    # Si no están en .env, intentar con Streamlit secrets (solo en deployment)
+    if not url or not key:
+        try:
+            url = st.secrets["SUPABASE_URL"]
+            key = st.secrets["SUPABASE_KEY"]
+        except (KeyError, FileNotFoundError, AttributeError):
+            # No hay secrets configurados, esto es normal en desarrollo local
+            pass
+
+    # Validar que existan las credenciales
+    if not url or not key:
+        print("⚠️ No se encontraron credenciales de Supabase. Sistema de auditoría deshabilitado.")
+        return None
+    return url, key
+
+
+def _crear_cliente():
+    # Se ejecuta en el hilo de conexión: una sola sesión HTTP (con pool de conexiones) para
+    # todas las inserciones y consultas, con timeout corto para no colgar al escritor
+    credenciales = _credenciales()
+    if credenciales is None:
+        return None
+
+    import httpx
+    from supabase import ClientOptions, create_client
+
+    sesion = httpx.Client(
+        timeout=TIMEOUT_AUDITORIA,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        follow_redirects=True,
+    )
+    cliente = create_client(*credenciales, options=ClientOptions(httpx_client=sesion))
+    print("✅ Conexión con Supabase establecida")
+    return cliente
+
+
+# El cliente real se crea en segundo plano en el primer registro o consulta
+_conexion = ConexionPerezosa(
+    _crear_cliente,
+    Cortocircuito(max_fallos=CORTE_FALLOS, espera=CORTE_SEGUNDOS),
+    espera_conexion=TIMEOUT_AUDITORIA
+)
+supabase = _conexion
+
+
+def _sin_backend():
+    # True si la auditoría está deshabilitada (sin credenciales o cliente anulado)
+    return supabase is None or (supabase is _conexion and _credenciales() is None)
+
+
+def estado_conexion():
+    """
+    Returns:
+        dict: conectando (bool) y estado del cortocircuito (estado, fallos, rechazadas)
+    """
+    if supabase is not _conexion:
+        return {"conectando": False, "estado": "cerrado" if supabase is not None else "deshabilitado"}
+    return dict(_conexion.cortocircuito.estadisticas(), conectando=_conexion.conectando)
+
+
+# ===========================
+# ESCRITOR ASÍNCRONO DE AUDITORÍA
+# ===========================
+
+# Archivo local donde se guardan los registros que no se pudieron enviar
+RUTA_PENDIENTES = os.getenv("AUDITORIA_PENDIENTES_PATH", "auditoria_pendiente.jsonl")
+
+_DETENER = object()
+
+
+class EscritorAuditoria:
+    """
+    Envía los registros de auditoría en segundo plano y por lotes
+
+    Los registros se encolan en memoria y un hilo los inserta en Supabase cuando
+    se junta un lote o pasa el intervalo. Si el backend no responde tras los
+    reintentos, el lote se guarda en un archivo local y se reenvía en el
+    siguiente envío exitoso. al_enviar(tabla), si se indica, se llama en el hilo
+    del escritor después de cada inserción exitosa.
+    """
+
+    def __init__(self, cliente, tamano_lote=50, intervalo=2.0, max_reintentos=3,
+                 espera_base=0.5, ruta_pendientes=RUTA_PENDIENTES, max_cola=10000, al_enviar=None):
+        self.cliente = cliente
+        self.al_enviar = al_enviar
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.ruta_pendientes = ruta_pendientes
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.pendientes_locales = 0
+
+    def encolar(self, tabla, registro, on_conflict=None):
+        """
+        Agrega un registro a la cola sin esperar la red
+
+        Args:
+            tabla (str): Tabla de destino en Supabase
+            registro (dict): Fila a insertar
+            on_conflict (str, optional): Columna única; si se indica se hace upsert en vez de insert
+
+        Returns:
+            bool: True si quedó en cola, False si se guardó directo en el archivo local
+        """
+        self._iniciar()
+        try:
+            self._cola.put_nowait(((tabla, on_conflict), registro))
+            return True
+        except queue.Full:
+            self._derramar((tabla, on_conflict), [registro])
+            return False
+
+    def vaciar(self):
+        """Bloquea hasta que todos los registros encolados se hayan procesado"""
+        if self._hilo is not None:
+            self._cola.join()
+
+    def detener(self):
+        """Envía lo pendiente y termina el hilo"""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._cola.put(_DETENER)
+            hilo.join()
+
+    def estadisticas(self):
+        return {
+            "en_cola": self._cola.qsize(),
+            "enviados": self.enviados,
+            "pendientes_locales": self.pendientes_locales,
+        }
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, name="escritor-auditoria", daemon=True)
+                self._hilo.start()
+
+    def _ejecutar(self):
+        detener = False
+        while not detener:
+            item = self._cola.get()
+            if item is _DETENER:
+                self._cola.task_done()
+                break
+
+            lote = [item]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _DETENER:
+                    self._cola.task_done()
+                    detener = True
+                    break
+                lote.append(item)
+
+            try:
+                self._enviar(lote)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _enviar(self, lote):
+        por_tabla = {}
+        for destino, registro in lote:
+            por_tabla.setdefault(destino, []).append(registro)
+
+        exito = True
+        for destino, registros in por_tabla.items():
+            if self._insertar(destino, registros):
+                self.enviados += len(registros)
+            else:
+                exito = False
+                self._derramar(destino, registros)
+
+        if exito:
+            self._reenviar_pendientes()
+
+    def _insertar(self, destino, registros):
+        tabla, on_conflict = destino
+        for intento in range(self.max_reintentos):
+            try:
+                if on_conflict:
+                    self.cliente.table(tabla).upsert(registros, on_conflict=on_conflict).execute()
+                else:
+                    self.cliente.table(tabla).insert(registros).execute()
+                if self.al_enviar is not None:
+                    self.al_enviar(tabla)
+                return True
+            except BackendNoDisponible as e:
+                # Backend caído o conectando: no se reintenta, el lote va al archivo local
+                print(f"Auditoría a {tabla} diferida: {str(e)}")
+                return False
+            except Exception as e:
+                print(f"Error al enviar auditoría a {tabla} (intento {intento + 1}): {str(e)}")
+                if intento + 1 < self.max_reintentos:
+                    time.sleep(self.espera_base * (2 ** intento))
+        return False
+
+    def _derramar(self, destino, registros):
+        tabla, on_conflict = destino
+        try:
+            with self._lock, open(self.ruta_pendientes, "a", encoding="utf-8") as f:
+                for registro in registros:
+                    pendiente = {"tabla": tabla, "on_conflict": on_conflict, "registro": registro}
+                    f.write(json.dumps(pendiente, default=str, ensure_ascii=False) + "\n")
+            self.pendientes_locales += len(registros)
+        except OSError as e:
+            print(f"Error al guardar auditoría pendiente: {str(e)}")
+
+    def _reenviar_pendientes(self):
+        if not os.path.exists(self.ruta_pendientes):
+            return
+
+        # Se renombra primero para que nuevos derrames vayan a un archivo limpio
+        en_proceso = f"{self.ruta_pendientes}.{os.getpid()}.reenvio"
+        with self._lock:
+            try:
+                os.replace(self.ruta_pendientes, en_proceso)
+            except OSError:
+                return
+
+        por_tabla = {}
+        with open(en_proceso, encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    pendiente = json.loads(linea)
+                    destino = (pendiente["tabla"], pendiente.get("on_conflict"))
+                    por_tabla.setdefault(destino, []).append(pendiente["registro"])
+        os.remove(en_proceso)
+
+        for destino, registros in por_tabla.items():
+            for inicio in range(0, len(registros), self.tamano_lote):
+                bloque = registros[inicio:inicio + self.tamano_lote]
+                if self._insertar(destino, bloque):
+                    self.enviados += len(bloque)
+                    self.pendientes_locales -= len(bloque)
+                else:
+                    self._derramar(destino, bloque)
+                    self.pendientes_locales -= len(bloque)
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obtener_escritor():
+    """
+    Devuelve el escritor de auditoría del proceso (se crea en el primer uso)
+
+    Returns:
+        EscritorAuditoria | None: None si no hay cliente de Supabase
+    """
+    global _escritor
+    if _sin_backend():
+        return None
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = EscritorAuditoria(supabase, al_enviar=_al_enviar)
+            atexit.register(_escritor.detener)
+            if supabase is _conexion:
+                # La conexión empieza con la primera escritura, sin bloquear a quien registra
+                _conexion.iniciar()
+        return _escritor
+
+
+def _al_enviar(tabla):
+    # La primera página del historial se invalida cuando la descarga ya está en el backend,
+    # no al encolarla: una consulta entre medio guardaría una página sin ella
+    if tabla == "descargas_auditoria":
+        _cache_paginas.invalidar_primeras()
+
+
+def configurar_cliente(cliente):
+    """
+    Reemplaza el cliente de Supabase (p. ej. por un cliente local en pruebas)
+
+    Args:
+        cliente: Objeto con la API de tablas de supabase, o None para deshabilitar
+    """
+    global supabase, _escritor, _resumen
+    with _escritor_lock:
+        if _escritor is not None:
+            _escritor.detener()
+            _escritor = None
+        supabase = cliente
+    with _resumen_lock:
+        _resumen = None
+    _cache_paginas.limpiar()
+
+
+# ===========================
+# RESUMEN DE ESTADÍSTICAS
+# ===========================
+
+# Archivo local con los contadores y sketches de descargas
+RUTA_RESUMEN = os.getenv("AUDITORIA_RESUMEN_PATH", "auditoria_resumen.json")
+TAMANO_PAGINA_RESUMEN = 1000
+
+_resumen = None
+_resumen_lock = threading.Lock()
+
+
+def obtener_resumen():
+    """
+    Devuelve el resumen incremental de descargas del proceso
+
+    Al crearse por primera vez fija una marca de tiempo: las descargas posteriores
+    se cuentan localmente y las anteriores se cargan una vez desde Supabase.
+
+    Returns:
+        ResumenDescargas: Resumen compartido
+    """
+    global _resumen
+    with _resumen_lock:
+        if _resumen is None:
+            _resumen = ResumenDescargas(RUTA_RESUMEN)
+            if _resumen.marca is None:
+                _resumen.marca = datetime.now().isoformat()
+                _resumen.guardar()
+        return _resumen
+
+
+def _pagina_keyset(nueva_consulta, cursor, tamano_pagina, desc):
+    # Página de descargas después del cursor (fecha_descarga, id) en el orden indicado. Varias
+    # filas pueden compartir fecha: primero se piden las que empatan con la fecha del cursor y
+    # siguen por id, y luego las de fechas posteriores (o anteriores si desc)
+    despues = "lt" if desc else "gt"
+    pagina = []
+    consulta = nueva_consulta()
+    if cursor is not None:
+        fecha, id_cursor = cursor
+        if id_cursor is not None:
+            empates = getattr(nueva_consulta().eq("fecha_descarga", fecha), despues)("id", id_cursor)
+            pagina = empates.order("id", desc=desc).limit(tamano_pagina).execute().data
+            if len(pagina) >= tamano_pagina:
+                return pagina
+        consulta = getattr(consulta, despues)("fecha_descarga", fecha)
+    consulta = consulta.order("fecha_descarga", desc=desc).order("id", desc=desc)
+    return pagina + consulta.limit(tamano_pagina - len(pagina)).execute().data
+
+
+def _cursor(pagina):
+    ultimo = pagina[-1]
+    return ultimo["fecha_descarga"], ultimo.get("id")
+
+
+def _historico_anterior(marca):
+    # Recorre en páginas las descargas anteriores a la marca (solo profesional e IP)
+    def nueva_consulta():
+        return supabase.table("descargas_auditoria")\
+            .select("id, profesional_nombre, ip_address, fecha_descarga")\
+            .lt("fecha_descarga", marca)
+
+    cursor = None
+    while True:
+        pagina = _pagina_keyset(nueva_consulta, cursor, TAMANO_PAGINA_RESUMEN, desc=False)
+        yield from pagina
+        if len(pagina) < TAMANO_PAGINA_RESUMEN:
+            break
+        cursor = _cursor(pagina)
+
+
+def _inicializar_resumen(resumen):
+    with _resumen_lock:
+        if not resumen.inicializado:
+            resumen.inicializar(_historico_anterior(resumen.marca))
 
 
 # ===========================
@@ -104,6 +487,45 @@ def obtener_session_id():
     return st.session_state.session_id
 
 
+# ===========================
+# DEDUPLICACIÓN DE CARGAS
+# ===========================
+
+# Cuántos pares (sesión, archivo) y listas se recuerdan por proceso
+MAX_CARGAS_RECORDADAS = 10000
+
+_cargas_registradas = OrderedDict()
+_listas_registradas = OrderedDict()
+_dedupe_lock = threading.Lock()
+escrituras_suprimidas = 0
+
+
+def _marcar_nuevo(vistos, clave):
+    # True si la clave no se había visto; mantiene solo las más recientes
+    with _dedupe_lock:
+        if clave in vistos:
+            vistos.move_to_end(clave)
+            return False
+        vistos[clave] = True
+        if len(vistos) > MAX_CARGAS_RECORDADAS:
+            vistos.popitem(last=False)
+        return True
+
+
+def _contar_suprimida():
+    global escrituras_suprimidas
+    with _dedupe_lock:
+        escrituras_suprimidas += 1
+
+
+def obtener_escrituras_suprimidas():
+    """
+    Returns:
+        int: Escrituras de auditoría evitadas por estar duplicadas
+    """
+    return escrituras_suprimidas
+
+
 # ===========================
 # FUNCIONES DE REGISTRO
 # ===========================
@@ -120,10 +542,13 @@ def registrar_descarga(nombre_profesional, nombre_archivo, info_adicional=None):
     Returns:
         tuple: (bool: éxito, str: mensaje)
     """
-    if supabase is None:
+    if _sin_backend():
         return False, "Sistema de auditoría no disponible"
     
     try:
+        # El resumen (y su marca) se crea antes de fechar el registro: así la descarga queda
+        # después de la marca y el histórico anterior no la vuelve a contar
+        resumen = obtener_resumen()
         info_usuario = obtener_info_usuario()
         
         registro = {
@@ -138,43 +563,68 @@ def registrar_descarga(nombre_profesional, nombre_archivo, info_adicional=None):
             "info_adicional": info_adicional or {}
         }
         
-        # Insertar en Supabase
-        response = supabase.table("descargas_auditoria").insert(registro).execute()
+        # Se envía en segundo plano; no se espera a Supabase
+        obtener_escritor().encolar("descargas_auditoria", registro)
+        if registro["fecha_descarga"] >= resumen.marca:
+            resumen.registrar(nombre_profesional, info_usuario["ip_address"])
         
         return True, "Registro exitoso"
     except Exception as e:
         return False, f"Error al registrar: {str(e)}"
 
 
-def registrar_carga_archivo(nombre_archivo_original, num_profesionales, nombres_profesionales):
+def registrar_carga_archivo(nombre_archivo_original, num_profesionales, nombres_profesionales, hash_archivo=None):
     """
     Registra cuando se carga un archivo Excel en la aplicación
+
+    Cada archivo se registra una sola vez por sesión aunque Streamlit vuelva a
+    ejecutar el script. La lista de profesionales se guarda una vez por archivo
+    en la tabla listas_profesionales y la carga la referencia por hash_archivo.
     
     Args:
         nombre_archivo_original (str): Nombre del archivo cargado
         num_profesionales (int): Cantidad de profesionales encontrados
         nombres_profesionales (list): Lista con nombres de todos los profesionales
+        hash_archivo (str, optional): SHA-256 del archivo; si no se indica se usa el de la lista
     
     Returns:
-        bool: True si el registro fue exitoso, False si hubo error
+        bool: True si el registro fue exitoso o ya existía, False si hubo error
     """
-    if supabase is None:
+    if _sin_backend():
         return False
     
     try:
+        nombres_profesionales = [str(n) for n in nombres_profesionales]
+        if hash_archivo is None:
+            hash_archivo = hashlib.sha256(json.dumps(nombres_profesionales).encode("utf-8")).hexdigest()
+
+        if not _marcar_nuevo(_cargas_registradas, (obtener_session_id(), hash_archivo)):
+            _contar_suprimida()
+            return True
+
+        escritor = obtener_escritor()
+        if _marcar_nuevo(_listas_registradas, hash_archivo):
+            escritor.encolar("listas_profesionales", {
+                "hash_archivo": hash_archivo,
+                "num_profesionales": num_profesionales,
+                "lista_profesionales": nombres_profesionales
+            }, on_conflict="hash_archivo")
+        else:
+            _contar_suprimida()
+
         info_usuario = obtener_info_usuario()
         
         registro = {
             "archivo_cargado": nombre_archivo_original,
             "num_profesionales": num_profesionales,
-            "lista_profesionales": nombres_profesionales,
+            "hash_archivo": hash_archivo,
             "ip_address": info_usuario["ip_address"],
             "user_agent": info_usuario["user_agent"],
             "fecha_carga": info_usuario["timestamp"],
             "sesion_id": obtener_session_id()
         }
         
-        supabase.table("cargas_archivos").insert(registro).execute()
+        escritor.encolar("cargas_archivos", registro)
         return True
     except Exception as e:
         print(f"Error al registrar carga de archivo: {str(e)}")
@@ -185,6 +635,95 @@ def registrar_carga_archivo(nombre_archivo_original, num_profesionales, nombres_
 # FUNCIONES DE CONSULTA
 # ===========================
 
+class CachePaginas:
+    """
+    Caché LRU con expiración para páginas de consultas de auditoría
+
+    Las páginas con cursor muestran registros ya escritos y no cambian; la primera
+    página (sin cursor) se invalida cuando una nueva descarga llega al backend.
+    """
+
+    def __init__(self, ttl=60.0, max_paginas=256):
+        self.ttl = ttl
+        self.max_paginas = max_paginas
+        self._paginas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._paginas.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self._paginas.pop(clave, None)
+                self.fallos += 1
+                return None
+            self._paginas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, pagina):
+        with self._lock:
+            self._paginas[clave] = (time.monotonic() + self.ttl, pagina)
+            self._paginas.move_to_end(clave)
+            while len(self._paginas) > self.max_paginas:
+                self._paginas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._paginas.clear()
+
+    def invalidar_primeras(self):
+        with self._lock:
+            for clave in [c for c in self._paginas if c[1] is None]:
+                del self._paginas[clave]
+
+
+_cache_paginas = CachePaginas(ttl=float(os.getenv("AUDITORIA_TTL_PAGINAS", "60")))
+
+
+def iterar_paginas_descargas(tamano_pagina=100, nombre_profesional=None, desde=None):
+    """
+    Recorre las descargas de la más reciente a la más antigua, una página a la vez
+
+    Usa paginación por cursor sobre (fecha_descarga, id): cada página pide solo los
+    registros anteriores al último de la página previa, y el id desempata las
+    descargas con la misma fecha. Las páginas se piden a Supabase a medida que se
+    consumen y se guardan en una caché corta.
+
+    Args:
+        tamano_pagina (int): Registros por página
+        nombre_profesional (str, optional): Filtrar por profesional
+        desde (str | tuple, optional): Cursor; una fecha (registros anteriores a ella)
+            o una tupla (fecha_descarga, id) del último registro ya visto
+
+    Yields:
+        list: Página de registros de descargas
+    """
+    if _sin_backend():
+        return
+
+    def nueva_consulta():
+        consulta = supabase.table("descargas_auditoria").select("*")
+        if nombre_profesional is not None:
+            consulta = consulta.eq("profesional_nombre", nombre_profesional)
+        return consulta
+
+    cursor = (desde, None) if isinstance(desde, str) else desde
+    while True:
+        clave = (nombre_profesional, cursor, tamano_pagina)
+        pagina = _cache_paginas.obtener(clave)
+        if pagina is None:
+            pagina = _pagina_keyset(nueva_consulta, cursor, tamano_pagina, desc=True)
+            _cache_paginas.guardar(clave, pagina)
+
+        if pagina:
+            yield pagina
+        if len(pagina) < tamano_pagina:
+            return
+        cursor = _cursor(pagina)
+
+
 def obtener_historial_descargas(limite=100):
     """
     Obtiene el historial de descargas desde Supabase
@@ -195,41 +734,38 @@ def obtener_historial_descargas(limite=100):
     Returns:
         list: Lista de registros de descargas
     """
-    if supabase is None:
+    if _sin_backend():
         return []
     
     try:
-        response = supabase.table("descargas_auditoria")\
-            .select("*")\
-            .order("fecha_descarga", desc=True)\
-            .limit(limite)\
-            .execute()
-        return response.data
+        return next(iterar_paginas_descargas(tamano_pagina=limite), [])
     except Exception as e:
         print(f"Error al obtener historial: {str(e)}")
         return []
 
 
-def obtener_descargas_por_profesional(nombre_profesional):
+def obtener_descargas_por_profesional(nombre_profesional, limite=None, tamano_pagina=500):
     """
-    Obtiene todas las descargas de un profesional específico
+    Obtiene las descargas de un profesional específico
     
     Args:
         nombre_profesional (str): Nombre del profesional
+        limite (int, optional): Número máximo de registros; None trae todas
+        tamano_pagina (int): Registros por consulta a Supabase
     
     Returns:
         list: Lista de descargas del profesional
     """
-    if supabase is None:
+    if _sin_backend():
         return []
     
     try:
-        response = supabase.table("descargas_auditoria")\
-            .select("*")\
-            .eq("profesional_nombre", nombre_profesional)\
-            .order("fecha_descarga", desc=True)\
-            .execute()
-        return response.data
+        descargas = []
+        for pagina in iterar_paginas_descargas(tamano_pagina, nombre_profesional):
+            descargas.extend(pagina)
+            if limite is not None and len(descargas) >= limite:
+                return descargas[:limite]
+        return descargas
     except Exception as e:
         print(f"Error al consultar descargas: {str(e)}")
         return []
@@ -238,38 +774,22 @@ def obtener_descargas_por_profesional(nombre_profesional):
 def obtener_estadisticas_descargas():
     """
     Obtiene estadísticas generales de descargas
+
+    Se leen del resumen local, que se actualiza en cada registrar_descarga; solo la
+    primera consulta recorre el histórico existente. Los únicos son estimaciones
+    HyperLogLog (exactas hasta 1024 valores distintos, luego error típico ~1.6 %).
     
     Returns:
         dict: Diccionario con estadísticas
     """
-    if supabase is None:
+    if _sin_backend():
         return {"total": 0, "profesionales_unicos": 0, "ips_unicas": 0}
     
     try:
-        # Total de descargas
-        response_total = supabase.table("descargas_auditoria")\
-            .select("*", count="exact")\
-            .execute()
-        
-        total = response_total.count if response_total.count else 0
-        
-        # Obtener datos para contar únicos
-        response_data = supabase.table("descargas_auditoria")\
-            .select("profesional_nombre, ip_address")\
-            .execute()
-        
-        if response_data.data:
-            profesionales_unicos = len(set(r["profesional_nombre"] for r in response_data.data))
-            ips_unicas = len(set(r["ip_address"] for r in response_data.data))
-        else:
-            profesionales_unicos = 0
-            ips_unicas = 0
-        
-        return {
-            "total": total,
-            "profesionales_unicos": profesionales_unicos,
-            "ips_unicas": ips_unicas
-        }
+        resumen = obtener_resumen()
+        if not resumen.inicializado:
+            _inicializar_resumen(resumen)
+        return resumen.estadisticas()
     except Exception as e:
         print(f"Error al obtener estadísticas: {str(e)}")
-        return {"total": 0, "profesionales_unicos": 0, "ips_unicas": 0}
\ No newline at end of file
+        return {"total": 0, "profesionales_unicos": 0, "ips_unicas": 0}
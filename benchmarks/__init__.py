@@ -0,0 +1,4 @@
+"""
+Benchmarks del generador de cuadros de facturación
+Cada módulo se ejecuta con python -m benchmarks.<modulo>
+"""
@@ -0,0 +1,111 @@
+"""
+Comparación de escritores del CUADRO SESIONES REALIZADAS
+Mide tiempo y pico de memoria (RSS) de DataFrame.to_excel frente al escritor write_only del generador
+
+Uso: python -m benchmarks.escritura [--filas 100000]
+"""
+
+import argparse
+import io
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from CuadroFacturacionGenerator import CuadroFacturacionGenerator, HOJA_CUADRO, COLUMNAS_AGRUPADAS
+
+ESCRITORES = ("to_excel", "write_only")
+
+
+def cuadro_sintetico(filas, semilla=11):
+    """Cuadro ya agrupado con las columnas y tipos que escribe el generador"""
+    rng = np.random.default_rng(semilla)
+    profesionales = rng.integers(0, 120, filas)
+    usuarios = rng.integers(0, 5000, filas)
+    df = pd.DataFrame({
+        "DOC PROFESIONAL": 1000 + profesionales,
+        "NOMBRE DEL PROFESIONAL": [f"PROFESIONAL NUMERO {p}" for p in profesionales],
+        "Tipo de nota": rng.choice(["TO", "TF", "PSI"], filas),
+        "NOMBRE USUARIO": [f"USUARIO APELLIDO {u}" for u in usuarios],
+        "Documento": 50000 + usuarios,
+        "AUT": [f"AUT{u % 50}" for u in usuarios],
+        "FECHA INI AUT": pd.Timestamp("2025-01-01"),
+        "FECHA FINAL": pd.Timestamp("2025-03-31"),
+        "NO de sesiones": rng.integers(1, 12, filas),
+        "Fechas de atención DIAS Y MESES": "3, 10, 17, 24 enero, 7 febrero",
+    })
+    return CuadroFacturacionGenerator()._construir_cuadro(df[COLUMNAS_AGRUPADAS])
+
+
+def _rss_pico_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def medir(escritor, filas):
+    """
+    Escribe un cuadro sintético con el escritor indicado en este proceso
+
+    Returns:
+        dict: Segundos, tamaño de salida y RSS pico antes y después de escribir
+    """
+    df = cuadro_sintetico(filas)
+    rss_antes = _rss_pico_mb()
+    salida = io.BytesIO()
+    inicio = time.perf_counter()
+    if escritor == "to_excel":
+        df.to_excel(salida, sheet_name=HOJA_CUADRO, index=False, engine="openpyxl")
+    else:
+        CuadroFacturacionGenerator()._escribir_cuadro(df, salida)
+    segundos = time.perf_counter() - inicio
+    rss_despues = _rss_pico_mb()
+    return {
+        "escritor": escritor,
+        "filas": filas,
+        "segundos": segundos,
+        "bytes_salida": len(salida.getvalue()),
+        "rss_pico_mb": rss_despues,
+        "rss_escritura_mb": rss_despues - rss_antes if rss_antes is not None else None,
+    }
+
+
+def comparar(filas):
+    """Mide cada escritor en un proceso aparte para que los picos de memoria no se mezclen"""
+    resultados = []
+    for escritor in ESCRITORES:
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.escritura", "--filas", str(filas), "--solo", escritor],
+            check=True, capture_output=True, text=True
+        ).stdout
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--solo", choices=ESCRITORES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        print(json.dumps(medir(args.solo, args.filas)))
+        return
+
+    for r in comparar(args.filas):
+        if r["rss_pico_mb"] is None:
+            rss = "RSS n/d"
+        else:
+            rss = f"RSS pico {r['rss_pico_mb']:.0f} MB (+{r['rss_escritura_mb']:.0f} MB al escribir)"
+        print(f"{r['escritor']:<10} {r['filas']} filas  {r['segundos']:7.2f} s  {rss}")
+
+
+if __name__ == "__main__":
+    main()
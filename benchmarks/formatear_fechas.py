@@ -0,0 +1,105 @@
+"""
+Micro-benchmark del formateo de fechas "días y meses"
+Compara la implementación original basada en strptime/strftime con formatear_dias
+
+Uso: python -m benchmarks.formatear_fechas [--grupos 50000] [--repeticiones 3]
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from CuadroFacturacionGenerator import formatear_dias
+
+
+def formatear_fechas_original(fechas):
+    # Copia de la implementación anterior de CuadroFacturacionGenerator._formatear_fechas
+    fechas_ordenadas = sorted(fechas, key=lambda x: datetime.strptime(x, "%Y-%m-%d"))
+    fechas_dict = defaultdict(list)
+
+    meses_es = {
+        "January": "enero", "February": "febrero", "March": "marzo",
+        "April": "abril", "May": "mayo", "June": "junio",
+        "July": "julio", "August": "agosto", "September": "septiembre",
+        "October": "octubre", "November": "noviembre", "December": "diciembre"
+    }
+
+    for fecha in fechas_ordenadas:
+        dt = datetime.strptime(fecha, "%Y-%m-%d")
+        mes = dt.strftime("%B")
+        dia = str(dt.day)
+        fechas_dict[mes].append(dia)
+
+    fechas_formateadas = []
+    for mes, dias in fechas_dict.items():
+        mes_es = meses_es.get(mes, mes)
+        fechas_formateadas.append(f"{', '.join(dias)} {mes_es}")
+
+    return ", ".join(fechas_formateadas)
+
+
+def generar_grupos(num_grupos, max_sesiones=12, semilla=7):
+    """Conjuntos de fechas como los de un mes de facturación (dentro de un mismo año)"""
+    rng = random.Random(semilla)
+    inicio = date(2025, 1, 1)
+    grupos = []
+    for _ in range(num_grupos):
+        base = rng.randint(0, 300)
+        dias = [inicio + timedelta(days=base + rng.randint(0, 45)) for _ in range(rng.randint(1, max_sesiones))]
+        grupos.append([d.isoformat() for d in dias])
+    return grupos
+
+
+def _medir(funcion, entradas, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        formatear_dias.cache_clear()
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            funcion(entrada)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def ejecutar(num_grupos=50000, repeticiones=3):
+    """
+    Returns:
+        dict: Segundos (mejor de las repeticiones) de cada implementación
+    """
+    grupos = generar_grupos(num_grupos)
+    ordinales = [
+        tuple(np.sort(np.array(g, dtype="datetime64[D]").astype(np.int64)).tolist())
+        for g in grupos
+    ]
+
+    for texto, dias in zip(grupos[:1000], ordinales[:1000]):
+        assert formatear_fechas_original(texto) == formatear_dias(dias)
+
+    return {
+        "grupos": num_grupos,
+        "original_s": _medir(formatear_fechas_original, grupos, repeticiones),
+        "formatear_dias_s": _medir(formatear_dias, ordinales, repeticiones),
+        # Cada grupo aparece dos veces: la segunda vez sale de la memoria
+        "formatear_dias_repetidos_s": _medir(formatear_dias, ordinales + ordinales, repeticiones) / 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grupos", type=int, default=50000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.grupos, args.repeticiones)
+    base = resultado["original_s"]
+    print(f"Grupos: {resultado['grupos']}")
+    for clave in ("original_s", "formatear_dias_s", "formatear_dias_repetidos_s"):
+        print(f"  {clave:<28} {resultado[clave]:8.3f} s   x{base / resultado[clave]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memoria del conglomerado con y sin codificación por categorías
+Compara el tamaño en memoria de las columnas de la clave y el tiempo y pico de memoria del agrupamiento
+(groupby sobre objetos frente a codigos_clave sobre categorías)
+
+Uso: python -m benchmarks.memoria [--filas 200000]
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+
+import numpy as np
+
+from CuadroFacturacionGenerator import COLUMNAS_CLAVE, codigos_clave
+from ingesta_conglomerado import leer_conglomerado
+from benchmarks.sintetico import agregar_argumentos, conglomerado_sintetico, escribir_libro, parametros
+
+
+def _medir(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    try:
+        resultado = funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, segundos, pico / 1024 / 1024
+
+
+def ejecutar(params):
+    """
+    Returns:
+        dict: Por representación ("texto" y "categorias"): MB del DataFrame y de las columnas
+            de la clave, y segundos y MB pico del agrupamiento
+    """
+    contenido = escribir_libro(conglomerado_sintetico(**params))
+    resultados = {}
+    codigos = {}
+
+    for nombre, categorias in (("texto", False), ("categorias", True)):
+        df = leer_conglomerado(io.BytesIO(contenido), categorias=categorias)
+        if categorias:
+            agrupar = lambda: codigos_clave(df)
+        else:
+            agrupar = lambda: df.groupby(COLUMNAS_CLAVE, sort=False, dropna=False).ngroup().to_numpy()
+
+        codigos[nombre], segundos, pico = _medir(agrupar)
+        resultados[nombre] = {
+            "dataframe_mb": df.memory_usage(deep=True, index=False).sum() / 1024 / 1024,
+            "clave_mb": df[COLUMNAS_CLAVE].memory_usage(deep=True, index=False).sum() / 1024 / 1024,
+            "agrupar_segundos": segundos,
+            "agrupar_pico_mb": pico,
+        }
+
+    if not np.array_equal(codigos["texto"], codigos["categorias"]):
+        raise AssertionError("Los códigos de grupo no coinciden entre las dos representaciones")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    resultados = ejecutar(parametros(args))
+    for nombre, r in resultados.items():
+        print(
+            f"{nombre:<11} DataFrame {r['dataframe_mb']:7.1f} MB  clave {r['clave_mb']:7.1f} MB  "
+            f"agrupar {r['agrupar_segundos']:6.3f} s (pico {r['agrupar_pico_mb']:6.1f} MB)"
+        )
+    texto, categorias = resultados["texto"], resultados["categorias"]
+    print(f"Reducción de memoria: {1 - categorias['dataframe_mb'] / texto['dataframe_mb']:.0%}, "
+          f"agrupamiento {texto['agrupar_segundos'] / categorias['agrupar_segundos']:.1f}x más rápido")
+
+
+if __name__ == "__main__":
+    main()
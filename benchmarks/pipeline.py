@@ -0,0 +1,190 @@
+"""
+Benchmark por etapas del generador de cuadros sobre un conglomerado sintético
+Mide tiempo (mejor de N repeticiones) y pico de memoria (tracemalloc) de lectura, índice de profesionales,
+filtrado, agregación, formateo y escritura, además de generar y generar_filtrado_por_profesional completos
+
+Uso: python -m benchmarks.pipeline [--filas 100000] [--sin-memoria] [--salida actual.json] [--comparar base.json --umbral 0.2]
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from CuadroFacturacionGenerator import CuadroFacturacionGenerator, COLUMNAS_CLAVE, formatear_dias
+from indice_profesionales import IndiceProfesionales
+from ingesta_conglomerado import leer_conglomerado
+from benchmarks.sintetico import agregar_argumentos, conglomerado_sintetico, escribir_libro, parametros
+
+VERSION_RESULTADOS = 1
+
+# Debajo de esta diferencia absoluta no se considera regresión (ruido de medición)
+TOLERANCIA_SEGUNDOS = 0.05
+TOLERANCIA_MB = 1.0
+
+
+def _medir_etapa(funcion, repeticiones, preparar=None, memoria=True):
+    # Tiempo: mejor de las repeticiones sin tracemalloc; memoria: una corrida aparte con tracemalloc
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+
+    if not memoria:
+        return {"segundos": mejor, "memoria_pico_mb": None}
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"segundos": mejor, "memoria_pico_mb": pico / 1024 / 1024}
+
+
+def ejecutar(params, repeticiones=3, memoria=True):
+    """
+    Genera el conglomerado sintético y mide cada etapa del generador
+
+    Args:
+        params (dict): Escala del conglomerado (ver benchmarks.sintetico.conglomerado_sintetico)
+        repeticiones (int): Corridas por etapa; se reporta la más rápida
+        memoria (bool): Si es False se omite la corrida con tracemalloc (que es varias veces más lenta)
+
+    Returns:
+        dict: Parámetros, entorno y, por etapa, segundos y memoria_pico_mb
+    """
+    contenido = escribir_libro(conglomerado_sintetico(**params))
+    generador = CuadroFacturacionGenerator()
+
+    df = leer_conglomerado(io.BytesIO(contenido))
+    indice = IndiceProfesionales(df)
+    profesionales = indice.nombres
+    agrupado = generador._agrupar_sesiones(df)
+    cuadro = generador._construir_cuadro(agrupado)
+
+    # Días de cada grupo, para medir el formateo aislado del resto de la agregación
+    codigos = df.groupby(COLUMNAS_CLAVE, sort=False, dropna=False).ngroup().to_numpy()
+    fechas = pd.to_datetime(df["FECHA ATENCION"]).to_numpy().astype("datetime64[D]")
+    orden = np.argsort(codigos, kind="stable")
+    grupos_fechas = np.split(fechas[orden], np.flatnonzero(np.diff(codigos[orden])) + 1)
+
+    def filtrar():
+        for nombre in profesionales:
+            indice.filtrar(df, [nombre])
+
+    def formatear():
+        for grupo in grupos_fechas:
+            generador._formatear_fechas(grupo)
+
+    def medir(funcion, preparar=None):
+        return _medir_etapa(funcion, repeticiones, preparar, memoria)
+
+    etapas = {
+        "lectura": medir(lambda: leer_conglomerado(io.BytesIO(contenido))),
+        "indice": medir(lambda: IndiceProfesionales(df)),
+        "filtrado": medir(filtrar),
+        # Con la memoria de formatear_dias llena, la agregación mide solo el agrupamiento
+        "agregacion": medir(lambda: generador._agrupar_sesiones(df)),
+        "formateo": medir(formatear, formatear_dias.cache_clear),
+        "escritura": medir(lambda: generador._escribir_cuadro(cuadro)),
+        "generar": medir(lambda: generador.generar(contenido), formatear_dias.cache_clear),
+        "generar_filtrado_por_profesional": medir(
+            lambda: generador.generar_filtrado_por_profesional(contenido, None, [profesionales[0]]),
+            formatear_dias.cache_clear
+        ),
+    }
+
+    return {
+        "version": VERSION_RESULTADOS,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": dict(params, repeticiones=repeticiones),
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "resumen": {
+            "bytes_libro": len(contenido),
+            "profesionales": len(profesionales),
+            "grupos": len(agrupado),
+        },
+        "etapas": etapas,
+    }
+
+
+def comparar(actual, base, umbral=0.2):
+    """
+    Compara dos corridas y devuelve las etapas que empeoraron más que el umbral
+
+    Args:
+        actual (dict): Resultado de ejecutar()
+        base (dict): Resultado de referencia
+        umbral (float): Aumento relativo permitido (0.2 = 20 %)
+
+    Returns:
+        list: Textos que describen cada regresión (vacía si no hay)
+    """
+    if actual["parametros"] != base["parametros"]:
+        print("Aviso: la base se midió con otros parámetros; la comparación puede no ser válida")
+
+    regresiones = []
+    for etapa, medida in actual["etapas"].items():
+        referencia = base["etapas"].get(etapa)
+        if referencia is None:
+            continue
+        for metrica, tolerancia in (("segundos", TOLERANCIA_SEGUNDOS), ("memoria_pico_mb", TOLERANCIA_MB)):
+            valor, anterior = medida[metrica], referencia[metrica]
+            if valor is None or anterior is None:
+                continue
+            if valor > anterior * (1 + umbral) and valor - anterior > tolerancia:
+                aumento = f" (+{valor / anterior - 1:.0%})" if anterior else ""
+                regresiones.append(f"{etapa}.{metrica}: {anterior:.3f} -> {valor:.3f}{aumento}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    agregar_argumentos(parser)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("--salida", help="Archivo JSON donde se guardan los resultados")
+    parser.add_argument("--comparar", help="Resultados JSON de referencia")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Aumento relativo permitido frente a la referencia")
+    args = parser.parse_args()
+
+    resultados = ejecutar(parametros(args), args.repeticiones, not args.sin_memoria)
+
+    for etapa, medida in resultados["etapas"].items():
+        memoria = "" if medida["memoria_pico_mb"] is None else f"  {medida['memoria_pico_mb']:8.1f} MB"
+        print(f"{etapa:<34} {medida['segundos']:8.3f} s{memoria}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.umbral)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            sys.exit(1)
+        print("Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
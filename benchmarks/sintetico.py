@@ -0,0 +1,131 @@
+"""
+Generador de libros CONGLOMERADO sintéticos para los benchmarks
+La escala se controla con filas, profesionales, pacientes, autorizaciones por paciente y días de dispersión
+
+Uso: python -m benchmarks.sintetico salida.xlsx [--filas 100000] [--profesionales 120] ...
+"""
+
+import argparse
+import io
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from ingesta_conglomerado import HOJA_CONGLOMERADO
+
+TIPOS_NOTA = np.array(["TO", "TF", "PSI", "FONO"], dtype=object)
+
+# Columnas en el orden del CONGLOMERADO real (incluye columnas que el generador no usa)
+COLUMNAS_LIBRO = [
+    "ID", "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota", "Documento",
+    "NOMBRE USUARIO", "FECHA INI AUT", "FECHA FINAL", "AUT", "FECHA ATENCION", "OBSERVACIONES"
+]
+
+
+def conglomerado_sintetico(filas=100000, profesionales=120, pacientes=5000, autorizaciones=3,
+                           dias=60, inicio="2025-01-01", semilla=11):
+    """
+    Arma un conglomerado sintético con columnas y tipos como los del archivo real
+
+    Args:
+        filas (int): Número de atenciones
+        profesionales (int): Profesionales distintos
+        pacientes (int): Pacientes distintos
+        autorizaciones (int): Autorizaciones distintas por paciente
+        dias (int): Días entre la primera y la última atención
+        inicio (str): Fecha de la primera atención
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        pandas.DataFrame: Columnas de COLUMNAS_LIBRO
+    """
+    rng = np.random.default_rng(semilla)
+    profesional = rng.integers(0, profesionales, filas)
+    paciente = rng.integers(0, pacientes, filas)
+    autorizacion = rng.integers(0, autorizaciones, filas)
+    fecha_inicio = pd.Timestamp(inicio)
+
+    # Cada autorización cubre un tramo fijo; las atenciones caen dentro del periodo
+    ini_aut = fecha_inicio + pd.to_timedelta((paciente * 7 + autorizacion * 30) % max(dias, 1), unit="D")
+    atencion = fecha_inicio + pd.to_timedelta(rng.integers(0, max(dias, 1), filas), unit="D") \
+        + pd.to_timedelta(rng.integers(7, 18, filas), unit="h")
+
+    nombres_profesional = np.array([f"PROFESIONAL NUMERO {p}" for p in range(profesionales)], dtype=object)
+    nombres_paciente = np.array([f"USUARIO APELLIDO {u}" for u in range(pacientes)], dtype=object)
+
+    return pd.DataFrame({
+        "ID": np.arange(1, filas + 1),
+        "DOC PROFESIONAL": 1000000 + profesional,
+        "NOMBRE DEL PROFESIONAL": nombres_profesional[profesional],
+        "Tipo de nota": TIPOS_NOTA[(profesional + autorizacion) % len(TIPOS_NOTA)],
+        "Documento": 50000000 + paciente,
+        "NOMBRE USUARIO": nombres_paciente[paciente],
+        "FECHA INI AUT": ini_aut,
+        "FECHA FINAL": ini_aut + pd.Timedelta(days=89),
+        "AUT": [f"AUT{p}-{a}" for p, a in zip(paciente.tolist(), autorizacion.tolist())],
+        "FECHA ATENCION": atencion,
+        "OBSERVACIONES": "SIN NOVEDAD",
+    })[COLUMNAS_LIBRO]
+
+
+def escribir_libro(df, destino=None):
+    """
+    Escribe el conglomerado en la hoja CONGLOMERADO de un .xlsx
+
+    Args:
+        df (pandas.DataFrame): Datos del conglomerado
+        destino: Ruta o archivo; None escribe en memoria
+
+    Returns:
+        bytes | None: Contenido del libro si destino es None
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(HOJA_CONGLOMERADO)
+    ws.append(list(df.columns))
+    columnas = [
+        df[c].dt.to_pydatetime().tolist() if pd.api.types.is_datetime64_any_dtype(df[c]) else df[c].tolist()
+        for c in df.columns
+    ]
+    for fila in zip(*columnas):
+        ws.append(fila)
+
+    salida = io.BytesIO() if destino is None else destino
+    wb.save(salida)
+    if destino is None:
+        return salida.getvalue()
+
+
+def agregar_argumentos(parser):
+    """Parámetros de escala comunes a los benchmarks que usan conglomerados sintéticos"""
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--profesionales", type=int, default=120)
+    parser.add_argument("--pacientes", type=int, default=5000)
+    parser.add_argument("--autorizaciones", type=int, default=3)
+    parser.add_argument("--dias", type=int, default=60)
+    parser.add_argument("--semilla", type=int, default=11)
+
+
+def parametros(args):
+    return {
+        "filas": args.filas,
+        "profesionales": args.profesionales,
+        "pacientes": args.pacientes,
+        "autorizaciones": args.autorizaciones,
+        "dias": args.dias,
+        "semilla": args.semilla,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("salida")
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    escribir_libro(conglomerado_sintetico(**parametros(args)), args.salida)
+    print(f"{args.salida}: {args.filas} filas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Caché en memoria del CONGLOMERADO ya parseado
+Evita volver a leer el Excel en cada rerun de Streamlit: la clave es el SHA-256 del archivo subido
+Si la entrada no está en memoria se intenta el sidecar Arrow en disco antes de parsear el Excel
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import sidecar_conglomerado
+from indice_profesionales import IndiceProfesionales
+
+
+# ===========================
+# UTILIDADES
+# ===========================
+
+def leer_contenido(origen):
+    """
+    Obtiene los bytes de un archivo a partir de una ruta, bytes o un objeto tipo archivo
+
+    Args:
+        origen: Ruta, bytes o archivo abierto en modo binario
+
+    Returns:
+        bytes: Contenido del archivo
+    """
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return bytes(origen)
+    if hasattr(origen, "getvalue"):
+        return origen.getvalue()
+    if hasattr(origen, "read"):
+        origen.seek(0)
+        return origen.read()
+    with open(origen, "rb") as f:
+        return f.read()
+
+
+def hash_contenido(contenido):
+    """
+    Calcula el SHA-256 del contenido de un archivo
+
+    Args:
+        contenido (bytes): Contenido del archivo
+
+    Returns:
+        str: Hash en hexadecimal
+    """
+    return hashlib.sha256(contenido).hexdigest()
+
+
+# ===========================
+# CACHÉ LRU
+# ===========================
+
+class CacheLRU:
+    """
+    Caché LRU acotada por un presupuesto de memoria en bytes
+
+    Cuando el total supera el presupuesto se descartan las entradas menos usadas.
+    Una entrada que por sí sola supera el presupuesto no se guarda.
+    Con ttl (segundos) además se descartan las entradas guardadas hace más de ese tiempo.
+    """
+
+    def __init__(self, presupuesto_bytes, medir=len, ttl=None):
+        self.presupuesto_bytes = presupuesto_bytes
+        self.ttl = ttl
+        self._medir = medir
+        self._entradas = OrderedDict()
+        self._bytes_usados = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartes = 0
+        self.expirados = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            self._expirar()
+            if clave not in self._entradas:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return self._entradas[clave][0]
+
+    def guardar(self, clave, valor):
+        """
+        Returns:
+            bool: False si el valor por sí solo supera el presupuesto y no se guardó
+        """
+        tamano = self._medir(valor)
+        with self._lock:
+            self._expirar()
+            if clave in self._entradas:
+                self._bytes_usados -= self._entradas.pop(clave)[1]
+            if tamano > self.presupuesto_bytes:
+                return False
+            expira = time.monotonic() + self.ttl if self.ttl else None
+            self._entradas[clave] = (valor, tamano, expira)
+            self._bytes_usados += tamano
+            while self._bytes_usados > self.presupuesto_bytes:
+                _, (_, tamano_descartado, _) = self._entradas.popitem(last=False)
+                self._bytes_usados -= tamano_descartado
+                self.descartes += 1
+            return True
+
+    def _expirar(self):
+        # Se llama con el lock tomado
+        if not self.ttl:
+            return
+        ahora = time.monotonic()
+        for clave in [c for c, (_, _, expira) in self._entradas.items() if expira <= ahora]:
+            self._bytes_usados -= self._entradas.pop(clave)[1]
+            self.expirados += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes_usados = 0
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Aciertos, fallos, descartes, expirados, entradas y memoria usada
+        """
+        with self._lock:
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "descartes": self.descartes,
+                "expirados": self.expirados,
+                "entradas": len(self._entradas),
+                "bytes_usados": self._bytes_usados,
+                "presupuesto_bytes": self.presupuesto_bytes,
+            }
+
+
+# ===========================
+# CACHÉ DEL CONGLOMERADO
+# ===========================
+
+class EntradaConglomerado:
+    """Hoja CONGLOMERADO parseada y tipada, junto con el índice de profesionales"""
+
+    def __init__(self, hash_archivo, df, indice):
+        self.hash_archivo = hash_archivo
+        self.df = df
+        self.indice = indice
+
+    @property
+    def profesionales(self):
+        return self.indice.nombres
+
+    def tamano_bytes(self):
+        return int(self.df.memory_usage(deep=True).sum()) + self.indice.tamano_bytes()
+
+
+class CacheConglomerado(CacheLRU):
+    """
+    Caché de conglomerados parseados, compartida por la vista previa y el generador
+    """
+
+    def __init__(self, presupuesto_bytes):
+        super().__init__(presupuesto_bytes, medir=EntradaConglomerado.tamano_bytes)
+
+    def obtener_conglomerado(self, origen):
+        """
+        Devuelve el conglomerado parseado, leyendo el Excel solo si no está en caché
+
+        Args:
+            origen: Ruta, bytes o archivo del Excel subido
+
+        Returns:
+            EntradaConglomerado: Datos parseados e índice de profesionales
+        """
+        contenido = leer_contenido(origen)
+        hash_archivo = hash_contenido(contenido)
+
+        entrada = self.obtener(hash_archivo)
+        if entrada is None:
+            df = sidecar_conglomerado.cargar_conglomerado(contenido, hash_archivo)
+            entrada = EntradaConglomerado(hash_archivo, df, IndiceProfesionales(df))
+            self.guardar(hash_archivo, entrada)
+        return entrada
+
+
+# Instancias compartidas por todo el proceso (sobreviven a los reruns de Streamlit)
+cache_conglomerado = CacheConglomerado(
+    int(float(os.getenv("CACHE_CONGLOMERADO_MB", "512")) * 1024 * 1024)
+)
+
+# Archivos ya generados, por (hash del conglomerado, profesional)
+cache_resultados = CacheLRU(
+    int(float(os.getenv("CACHE_RESULTADOS_MB", "256")) * 1024 * 1024),
+    ttl=float(os.getenv("CACHE_RESULTADOS_TTL", "3600")) or None
+)
@@ -0,0 +1,221 @@
+"""
+Cola local de trabajos de generación
+Un grupo fijo de hilos ejecuta las generaciones fuera del hilo del script de Streamlit; cada trabajo
+tiene estado y progreso, y el archivo terminado se guarda en el almacén de resultados (con TTL)
+Los trabajos en cola o en ejecución con la misma clave (hash del archivo, profesional) se juntan en uno
+"""
+
+import os
+import queue
+import threading
+import time
+
+from cache_conglomerado import cache_resultados
+
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+ERROR = "error"
+
+# Avance aproximado al entrar a cada etapa del generador
+PROGRESO_ETAPAS = {
+    "lectura": 0.1,
+    "filtrado": 0.3,
+    "agregacion": 0.4,
+    "formateo": 0.6,
+    "escritura": 0.8,
+}
+
+
+class ColaLlena(RuntimeError):
+    """Hay demasiados trabajos esperando; se debe reintentar más tarde"""
+
+
+class Trabajo:
+    """
+    Una generación encolada
+
+    Attributes:
+        clave (tuple): Identifica el resultado, p. ej. (hash del archivo, profesional)
+        estado (str): EN_COLA, EJECUTANDO, TERMINADO o ERROR
+        progreso (float): Entre 0 y 1
+        etapa (str): Última etapa informada por la función
+        error (str): Mensaje del error si estado es ERROR
+        metricas: Lo que la función deje aquí (p. ej. ultimas_metricas del generador)
+        resultado (bytes): El archivo, solo si no cupo en el almacén de resultados
+    """
+
+    def __init__(self, clave, funcion):
+        self.clave = clave
+        self.funcion = funcion
+        self.estado = EN_COLA
+        self.progreso = 0.0
+        self.etapa = None
+        self.error = None
+        self.metricas = None
+        self.resultado = None
+        self.creado = time.monotonic()
+        self.terminado = None
+        self._listo = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado in (EN_COLA, EJECUTANDO)
+
+    def avance(self, etapa):
+        """Informa la etapa en curso; el progreso nunca retrocede"""
+        self.etapa = etapa
+        self.progreso = max(self.progreso, PROGRESO_ETAPAS.get(etapa, self.progreso))
+
+    def esperar(self, timeout=None):
+        """
+        Returns:
+            bool: True si el trabajo terminó (bien o con error) antes del timeout
+        """
+        return self._listo.wait(timeout)
+
+
+class ColaTrabajos:
+    """
+    Grupo de hilos con una cola acotada
+
+    Los hilos se crean en el primer envío. La función de cada trabajo recibe el Trabajo
+    (para informar avance) y devuelve los bytes del archivo, que quedan en `resultados`
+    bajo la clave del trabajo. Un archivo más grande que todo el almacén se queda en el
+    Trabajo mientras se conserve su estado (ver resultado()).
+
+    Args:
+        resultados (CacheLRU): Almacén de los archivos terminados
+        max_workers (int): Hilos que generan a la vez
+        max_cola (int): Trabajos que pueden esperar; más allá enviar() lanza ColaLlena
+        retener (float): Segundos que se conserva el estado de un trabajo terminado
+    """
+
+    def __init__(self, resultados, max_workers=2, max_cola=20, retener=600.0):
+        self.resultados = resultados
+        self.max_workers = max_workers
+        self.retener = retener
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._trabajos = {}
+        self._hilos = []
+        self._lock = threading.Lock()
+        self.completados = 0
+        self.fallidos = 0
+        self.coalescidos = 0
+
+    def enviar(self, clave, funcion):
+        """
+        Encola una generación, o devuelve la que ya está en cola o ejecutándose con la misma clave
+
+        Args:
+            clave (tuple): Clave del resultado
+            funcion: Función que recibe el Trabajo y devuelve bytes
+
+        Returns:
+            Trabajo: El trabajo nuevo o el existente
+
+        Raises:
+            ColaLlena: Si la cola está llena
+        """
+        self._iniciar()
+        with self._lock:
+            self._purgar()
+            existente = self._trabajos.get(clave)
+            if existente is not None and existente.activo:
+                self.coalescidos += 1
+                return existente
+
+            trabajo = Trabajo(clave, funcion)
+            try:
+                self._cola.put_nowait(trabajo)
+            except queue.Full:
+                raise ColaLlena(f"Hay {self._cola.qsize()} trabajos en espera, intenta en unos minutos") from None
+            self._trabajos[clave] = trabajo
+            return trabajo
+
+    def obtener(self, clave):
+        """
+        Returns:
+            Trabajo | None: El último trabajo con esa clave, si todavía se conserva
+        """
+        with self._lock:
+            return self._trabajos.get(clave)
+
+    def resultado(self, clave):
+        """
+        Returns:
+            bytes | None: El archivo terminado, del almacén o del trabajo si no cupo en él
+        """
+        contenido = self.resultados.obtener(clave)
+        if contenido is None:
+            trabajo = self.obtener(clave)
+            contenido = trabajo.resultado if trabajo is not None else None
+        return contenido
+
+    def en_espera(self, trabajo):
+        """
+        Returns:
+            int: Trabajos en cola delante de este (0 si ya empezó o terminó)
+        """
+        if trabajo.estado != EN_COLA:
+            return 0
+        with self._lock:
+            return sum(
+                1 for t in self._trabajos.values()
+                if t.estado == EN_COLA and t.creado < trabajo.creado
+            )
+
+    def estadisticas(self):
+        with self._lock:
+            estados = [t.estado for t in self._trabajos.values()]
+        return {
+            "en_cola": estados.count(EN_COLA),
+            "ejecutando": estados.count(EJECUTANDO),
+            "completados": self.completados,
+            "fallidos": self.fallidos,
+            "coalescidos": self.coalescidos,
+        }
+
+    def _iniciar(self):
+        with self._lock:
+            while len(self._hilos) < self.max_workers:
+                hilo = threading.Thread(
+                    target=self._ejecutar, name=f"generador-{len(self._hilos) + 1}", daemon=True
+                )
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def _purgar(self):
+        # Se llama con el lock tomado: olvida los trabajos terminados hace más de `retener` segundos
+        limite = time.monotonic() - self.retener
+        for clave in [c for c, t in self._trabajos.items() if t.terminado is not None and t.terminado < limite]:
+            del self._trabajos[clave]
+
+    def _ejecutar(self):
+        while True:
+            trabajo = self._cola.get()
+            trabajo.estado = EJECUTANDO
+            try:
+                contenido = trabajo.funcion(trabajo)
+                if not self.resultados.guardar(trabajo.clave, contenido):
+                    trabajo.resultado = contenido
+                trabajo.progreso = 1.0
+                trabajo.estado = TERMINADO
+                self.completados += 1
+            except Exception as e:
+                print(f"❌ Error en el trabajo {trabajo.clave}: {e}")
+                trabajo.error = str(e)
+                trabajo.estado = ERROR
+                self.fallidos += 1
+            finally:
+                trabajo.terminado = time.monotonic()
+                trabajo._listo.set()
+                self._cola.task_done()
+
+
+# Instancia compartida por todas las sesiones del proceso
+cola_generacion = ColaTrabajos(
+    cache_resultados,
+    max_workers=int(os.getenv("GENERACION_WORKERS", "2")),
+    max_cola=int(os.getenv("GENERACION_MAX_COLA", "20")),
+)
@@ -0,0 +1,170 @@
+"""
+Conexión perezosa con el backend de auditoría y cortocircuito ante caídas
+El cliente se crea en segundo plano la primera vez que se usa y luego se reutiliza; si el backend
+falla varias veces seguidas, las llamadas fallan al instante durante un tiempo en vez de esperar
+"""
+
+import threading
+import time
+
+
+class BackendNoDisponible(ConnectionError):
+    """El backend de auditoría está caído, todavía conectando o sin credenciales"""
+
+
+class Cortocircuito:
+    """
+    Corta las llamadas al backend después de varios fallos seguidos
+
+    Cerrado: las llamadas pasan. Tras max_fallos fallos seguidos se abre y las llamadas
+    se rechazan sin tocar la red durante `espera` segundos; luego deja pasar una sola
+    llamada de prueba, y según su resultado se cierra o vuelve a abrirse.
+
+    Attributes:
+        fallos (int): Fallos seguidos
+        rechazadas (int): Llamadas rechazadas sin ir a la red
+    """
+
+    def __init__(self, max_fallos=3, espera=30.0):
+        self.max_fallos = max_fallos
+        self.espera = espera
+        self.fallos = 0
+        self.rechazadas = 0
+        self._abierto_hasta = None
+        self._probando = False
+        self._lock = threading.Lock()
+
+    @property
+    def abierto(self):
+        with self._lock:
+            return self._abierto_hasta is not None and time.monotonic() < self._abierto_hasta
+
+    def permitir(self):
+        """
+        Returns:
+            bool: True si la llamada puede ir al backend
+        """
+        with self._lock:
+            if self._abierto_hasta is None:
+                return True
+            if time.monotonic() >= self._abierto_hasta and not self._probando:
+                self._probando = True
+                return True
+            self.rechazadas += 1
+            return False
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self._abierto_hasta = None
+            self._probando = False
+
+    def rechazar(self):
+        with self._lock:
+            self.rechazadas += 1
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            self._probando = False
+            if self.fallos >= self.max_fallos:
+                self._abierto_hasta = time.monotonic() + self.espera
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "estado": "abierto" if self._abierto_hasta is not None else "cerrado",
+                "fallos": self.fallos,
+                "rechazadas": self.rechazadas,
+            }
+
+
+class _ConsultaProtegida:
+    # Envuelve el constructor de consultas: cada execute() cuenta para el cortocircuito
+
+    def __init__(self, consulta, cortocircuito):
+        self._consulta = consulta
+        self._cortocircuito = cortocircuito
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._consulta, nombre)
+        if not callable(atributo):
+            return atributo
+
+        def encadenar(*args, **kwargs):
+            return _ConsultaProtegida(atributo(*args, **kwargs), self._cortocircuito)
+
+        return encadenar
+
+    def execute(self):
+        if not self._cortocircuito.permitir():
+            raise BackendNoDisponible("Backend de auditoría no disponible (cortocircuito abierto)")
+        try:
+            respuesta = self._consulta.execute()
+        except Exception:
+            self._cortocircuito.fallo()
+            raise
+        self._cortocircuito.exito()
+        return respuesta
+
+
+class ConexionPerezosa:
+    """
+    Cliente con la API de tablas de supabase que se crea en un hilo aparte en el primer uso
+
+    Args:
+        fabrica: Función sin argumentos que devuelve el cliente real, o None si no hay credenciales
+        cortocircuito (Cortocircuito, optional): Compartido por todas las consultas
+        espera_conexion (float): Segundos que una consulta espera a que termine la conexión
+    """
+
+    def __init__(self, fabrica, cortocircuito=None, espera_conexion=5.0):
+        self._fabrica = fabrica
+        self.cortocircuito = cortocircuito or Cortocircuito()
+        self.espera_conexion = espera_conexion
+        self._cliente = None
+        self._error = None
+        self._lista = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """Empieza a conectar en segundo plano (solo la primera vez); no bloquea"""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._conectar, name="conexion-auditoria", daemon=True)
+                self._hilo.start()
+
+    def _conectar(self):
+        try:
+            self._cliente = self._fabrica()
+        except Exception as e:
+            self._error = e
+            print(f"❌ Error al conectar con Supabase: {e}")
+        finally:
+            self._lista.set()
+
+    @property
+    def conectando(self):
+        return self._hilo is not None and not self._lista.is_set()
+
+    def obtener(self, esperar=None):
+        """
+        Devuelve el cliente real, esperando a lo sumo espera_conexion segundos
+
+        Raises:
+            BackendNoDisponible: Si no hay credenciales, la conexión falló o aún no termina
+        """
+        self.iniciar()
+        if not self._lista.wait(self.espera_conexion if esperar is None else esperar):
+            raise BackendNoDisponible("Conexión con el backend de auditoría en curso")
+        if self._cliente is None:
+            raise BackendNoDisponible(str(self._error or "Sin credenciales de auditoría"))
+        return self._cliente
+
+    def table(self, nombre):
+        if self.cortocircuito.abierto:
+            # No se espera la conexión si ya se sabe que el backend está caído
+            self.cortocircuito.rechazar()
+            raise BackendNoDisponible("Backend de auditoría no disponible (cortocircuito abierto)")
+        return _ConsultaProtegida(self.obtener().table(nombre), self.cortocircuito)
@@ -0,0 +1,169 @@
+"""
+Generación de cuadros por lotes, sin interfaz
+Para corridas programadas (nocturnas o de fin de mes): lee uno o varios conglomerados y escribe
+un .xlsx por profesional en una carpeta por archivo, usando varios procesos
+
+Uso: python generar_cuadros.py CONGLOMERADO.xlsx [OTRO.xlsx ...] -o salida [-p "NOMBRE" ...] [-w 4] [--auditar]
+     python generar_cuadros.py MES1.xlsx MES2.xlsx MES3.xlsx -o salida --combinar [--limite-mb 256]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Antes de importar los módulos del proyecto: varios leen su configuración del .env al importarse
+load_dotenv()
+
+from CuadroFacturacionGenerator import CuadroFacturacionGenerator, nombre_archivo_cuadro
+from ingesta_conglomerado import leer_conglomerado
+
+
+def ejecutar_lote(rutas, directorio_salida, profesionales=None, max_workers=None, auditar=False):
+    """
+    Genera los cuadros de uno o varios conglomerados
+
+    Args:
+        rutas (list): Rutas de los Excel con la hoja CONGLOMERADO
+        directorio_salida (str): Carpeta de salida; cada archivo usa una subcarpeta con su nombre
+            (con sufijo _2, _3... si dos archivos de distintas carpetas se llaman igual)
+        profesionales (list, optional): Solo estos profesionales; None genera todos
+        max_workers (int, optional): Procesos de escritura; None usa os.cpu_count()
+        auditar (bool): Si es True registra cada cuadro en el sistema de auditoría
+
+    Returns:
+        dict: Por archivo (ruta, carpeta, filas, archivos, faltantes, segundos) y totales
+            de filas, archivos, segundos, filas_por_segundo y archivos_por_segundo
+    """
+    generador = CuadroFacturacionGenerator()
+    inicio = time.perf_counter()
+    resultados = []
+    carpetas = set()
+
+    for ruta in rutas:
+        inicio_archivo = time.perf_counter()
+        df = leer_conglomerado(ruta, profesionales)
+        faltantes = []
+        if profesionales is not None:
+            presentes = set(df["NOMBRE DEL PROFESIONAL"].dropna())
+            faltantes = [nombre for nombre in profesionales if nombre not in presentes]
+
+        carpeta = _carpeta_unica(directorio_salida, ruta, carpetas)
+        exportado = generador.exportar_en_paralelo(df, carpeta, max_workers)
+
+        if auditar:
+            _auditar(ruta, df, exportado["archivos"])
+
+        resultados.append({
+            "ruta": ruta,
+            "carpeta": carpeta,
+            "filas": len(df),
+            "archivos": [archivo["ruta"] for archivo in exportado["archivos"]],
+            "faltantes": faltantes,
+            "segundos": time.perf_counter() - inicio_archivo,
+        })
+
+    segundos = time.perf_counter() - inicio
+    filas = sum(r["filas"] for r in resultados)
+    archivos = sum(len(r["archivos"]) for r in resultados)
+    return {
+        "archivos_entrada": resultados,
+        "filas": filas,
+        "archivos": archivos,
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos if segundos else 0.0,
+        "archivos_por_segundo": archivos / segundos if segundos else 0.0,
+    }
+
+
+def _carpeta_unica(directorio_salida, ruta, usadas):
+    # Dos entradas con el mismo nombre en carpetas distintas no deben escribir en la misma subcarpeta
+    base = os.path.join(directorio_salida, os.path.splitext(os.path.basename(ruta))[0])
+    carpeta, n = base, 2
+    while os.path.normcase(carpeta) in usadas:
+        carpeta, n = f"{base}_{n}", n + 1
+    usadas.add(os.path.normcase(carpeta))
+    return carpeta
+
+
+def combinar(rutas, directorio_salida, limite_mb=256):
+    """
+    Escribe un solo cuadro con todos los conglomerados, como si fueran un único archivo
+
+    Returns:
+        int: Código de salida (0 si se generó el cuadro)
+    """
+    generador = CuadroFacturacionGenerator()
+    os.makedirs(directorio_salida, exist_ok=True)
+    ruta = os.path.join(directorio_salida, nombre_archivo_cuadro("COMBINADO"))
+    generador.generar_combinado(rutas, ruta, limite_mb=limite_mb)
+
+    metricas = generador.ultimas_metricas
+    conteos = metricas.conteos
+    print(
+        f"{ruta}: {conteos['filas']} filas de {conteos['archivos']} archivos, {conteos['grupos']} grupos, "
+        f"{conteos['volcados']} volcados a disco, {conteos['reparticiones']} reparticiones "
+        f"({metricas.segundos_total:.1f} s)"
+    )
+    return 0 if conteos["filas"] else 1
+
+
+def _auditar(ruta, df, archivos):
+    # Importación diferida: auditoria_manager carga el cliente de Supabase
+    import auditoria_manager
+
+    for archivo in archivos:
+        auditoria_manager.registrar_descarga(
+            nombre_profesional=archivo["profesional"],
+            nombre_archivo=os.path.basename(archivo["ruta"]),
+            info_adicional={
+                "archivo_origen": os.path.basename(ruta),
+                "num_registros": len(df),
+                "origen": "lote",
+            }
+        )
+    escritor = auditoria_manager.obtener_escritor()
+    if escritor is not None:
+        escritor.vaciar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("conglomerados", nargs="+", help="Archivos Excel con la hoja CONGLOMERADO")
+    parser.add_argument("-o", "--salida", required=True, help="Carpeta de salida")
+    parser.add_argument("-p", "--profesional", action="append", dest="profesionales",
+                        help="Nombre del profesional (se puede repetir); por defecto todos")
+    parser.add_argument("-w", "--workers", type=int, help="Procesos de escritura (1 = en serie)")
+    parser.add_argument("--auditar", action="store_true", help="Registrar cada cuadro en la auditoría")
+    parser.add_argument("--combinar", action="store_true",
+                        help="Un solo cuadro con todos los archivos, leídos por bloques y con memoria acotada")
+    parser.add_argument("--limite-mb", type=float, default=256, help="Memoria del agregado antes de volcar a disco")
+    args = parser.parse_args(argv)
+
+    faltantes_entrada = [ruta for ruta in args.conglomerados if not os.path.exists(ruta)]
+    if faltantes_entrada:
+        parser.error(f"No existe: {', '.join(faltantes_entrada)}")
+
+    if args.combinar:
+        if args.profesionales or args.workers is not None or args.auditar:
+            parser.error("--combinar no admite -p/--profesional, -w/--workers ni --auditar")
+        return combinar(args.conglomerados, args.salida, args.limite_mb)
+
+    resumen = ejecutar_lote(args.conglomerados, args.salida, args.profesionales, args.workers, args.auditar)
+
+    for r in resumen["archivos_entrada"]:
+        print(f"{r['ruta']}: {r['filas']} filas, {len(r['archivos'])} cuadros en {r['carpeta']} ({r['segundos']:.1f} s)")
+        for nombre in r["faltantes"]:
+            print(f"  ⚠️ Sin registros para: {nombre}")
+
+    print(
+        f"Total: {resumen['filas']} filas, {resumen['archivos']} cuadros en {resumen['segundos']:.1f} s "
+        f"({resumen['filas_por_segundo']:.0f} filas/s, {resumen['archivos_por_segundo']:.2f} cuadros/s)"
+    )
+    return 0 if resumen["archivos"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
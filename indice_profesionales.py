@@ -0,0 +1,166 @@
+"""
+Índice de profesionales de un conglomerado, construido una vez por archivo
+Guarda para cada profesional las posiciones de sus filas (un tramo de una permutación estable) y sus
+conteos, para filtrar sin recorrer todo el DataFrame y llenar el selector sin volver a calcular nada
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+def normalizar_nombre(nombre):
+    """
+    Forma de comparación de un nombre: sin tildes, en mayúsculas y con espacios simples
+
+    Args:
+        nombre: Nombre tal como viene en el conglomerado
+
+    Returns:
+        str: Nombre normalizado
+    """
+    sin_tildes = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", sin_tildes).strip().upper()
+
+
+def _codigos(columna):
+    # Códigos enteros (-1 para vacíos) y valores distintos de una columna
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        return columna.cat.codes.to_numpy(dtype=np.int64), list(columna.cat.categories)
+    codigos, valores = pd.factorize(columna)
+    return codigos.astype(np.int64), list(valores)
+
+
+class EntradaProfesional:
+    """
+    Filas y conteos de un profesional
+
+    Attributes:
+        nombre (str): Nombre tal como viene en el conglomerado
+        normalizado (str): Nombre normalizado (ver normalizar_nombre)
+        documento: DOC PROFESIONAL de su primera fila
+        registros (int): Filas del conglomerado
+        sesiones (int): Sesiones que factura su cuadro (una por fila, como "NO de sesiones")
+    """
+
+    def __init__(self, nombre, documento, inicio, fin):
+        self.nombre = nombre
+        self.normalizado = normalizar_nombre(nombre)
+        self.documento = documento
+        self.inicio = inicio
+        self.fin = fin
+
+    @property
+    def registros(self):
+        return self.fin - self.inicio
+
+    @property
+    def sesiones(self):
+        # Cada fila del conglomerado es una atención: el cuadro suma una sesión por fila
+        return self.registros
+
+
+class IndiceProfesionales:
+    """
+    Posiciones de las filas de cada profesional dentro del DataFrame del conglomerado
+
+    Las filas se ordenan una vez por profesional con un orden estable: las de cada uno
+    quedan en un tramo contiguo de `orden` y conservan su orden original.
+
+    Args:
+        df (pandas.DataFrame): Conglomerado leído (con NOMBRE DEL PROFESIONAL y DOC PROFESIONAL)
+
+    Attributes:
+        nombres (list): Profesionales ordenados por nombre normalizado (para el selector)
+    """
+
+    def __init__(self, df):
+        codigos, valores = _codigos(df["NOMBRE DEL PROFESIONAL"])
+        self.orden = np.argsort(codigos, kind="stable")
+        codigos_ordenados = codigos[self.orden]
+        rango = np.arange(len(valores))
+        inicios = np.searchsorted(codigos_ordenados, rango, side="left")
+        fines = np.searchsorted(codigos_ordenados, rango, side="right")
+        documentos = df["DOC PROFESIONAL"].to_numpy()
+
+        self._entradas = {}
+        for codigo, nombre in enumerate(valores):
+            if fines[codigo] > inicios[codigo]:
+                self._entradas[nombre] = EntradaProfesional(
+                    nombre,
+                    documentos[self.orden[inicios[codigo]]],
+                    int(inicios[codigo]),
+                    int(fines[codigo]),
+                )
+        # Orden estable: a igual nombre normalizado se respeta el orden alfabético original
+        self.nombres = sorted(sorted(self._entradas), key=lambda n: self._entradas[n].normalizado)
+
+    def __contains__(self, nombre):
+        return nombre in self._entradas
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def entrada(self, nombre):
+        """
+        Returns:
+            EntradaProfesional | None: Datos del profesional, o None si no tiene filas
+        """
+        return self._entradas.get(nombre)
+
+    def buscar(self, texto):
+        """
+        Profesionales cuyo nombre normalizado o DOC PROFESIONAL coincide con el texto
+
+        Returns:
+            list: Nombres en el orden de `nombres`
+        """
+        normalizado = normalizar_nombre(texto)
+        return [
+            nombre for nombre in self.nombres
+            if self._entradas[nombre].normalizado == normalizado
+            or str(self._entradas[nombre].documento) == str(texto).strip()
+        ]
+
+    def posiciones(self, nombres):
+        """
+        Posiciones de las filas de los profesionales indicados, en el orden original del DataFrame
+
+        Args:
+            nombres (list): Nombres de profesionales; los que no están se ignoran
+
+        Returns:
+            numpy.ndarray: Posiciones para DataFrame.iloc
+        """
+        tramos = [
+            self.orden[entrada.inicio:entrada.fin]
+            for entrada in (self._entradas.get(nombre) for nombre in dict.fromkeys(nombres))
+            if entrada is not None
+        ]
+        if not tramos:
+            return np.empty(0, dtype=np.int64)
+        if len(tramos) == 1:
+            return tramos[0]
+        return np.sort(np.concatenate(tramos))
+
+    def filtrar(self, df, nombres):
+        """
+        Filas de los profesionales indicados, igual que df[df[...].isin(nombres)] pero sin recorrer df
+
+        Args:
+            df (pandas.DataFrame): El mismo DataFrame con el que se construyó el índice
+            nombres (list): Nombres de profesionales
+
+        Returns:
+            pandas.DataFrame: Filas filtradas
+        """
+        return df.iloc[self.posiciones(nombres)]
+
+    def etiqueta(self, nombre):
+        """Texto para el selector: nombre con las sesiones que factura su cuadro"""
+        return f"{nombre} ({self._entradas[nombre].sesiones} sesiones)"
+
+    def tamano_bytes(self):
+        return int(self.orden.nbytes) + sum(len(str(n)) + 200 for n in self._entradas)
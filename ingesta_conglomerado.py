@@ -0,0 +1,180 @@
+"""
+Lectura rápida de la hoja CONGLOMERADO
+Solo materializa las columnas que usa el generador y, si se indica, solo las filas de ciertos profesionales
+"""
+
+import importlib.util
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+HOJA_CONGLOMERADO = "CONGLOMERADO"
+
+# Columnas del CONGLOMERADO que usa el generador
+COLUMNAS_CONGLOMERADO = [
+    "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota",
+    "Documento", "NOMBRE USUARIO", "FECHA INI AUT", "FECHA FINAL", "AUT", "FECHA ATENCION"
+]
+
+# Columnas de texto que se repiten en miles de filas: se guardan como categorías (diccionario + códigos)
+COLUMNAS_CATEGORICAS = [
+    "DOC PROFESIONAL", "NOMBRE DEL PROFESIONAL", "Tipo de nota", "Documento", "NOMBRE USUARIO", "AUT"
+]
+
+
+def motor_disponible():
+    """
+    Devuelve el motor de lectura más rápido instalado
+
+    Returns:
+        str: "calamine" si python-calamine está instalado, si no "openpyxl"
+    """
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
+def _convertir_celda(valor):
+    # Misma conversión que aplica pandas.read_excel a cada celda con openpyxl
+    if valor is None:
+        return ""
+    if type(valor) is float:
+        return int(valor) if valor.is_integer() else valor
+    if type(valor) is str and valor in ERROR_CODES:
+        return float("nan")
+    return valor
+
+
+def _filas_openpyxl(origen, profesionales):
+    # Recorre la hoja en modo solo lectura y entrega cada fila ya convertida. Como read_excel,
+    # las filas vacías al final de la hoja se descartan: solo se entregan si les sigue una con datos
+    wb = load_workbook(origen, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[HOJA_CONGLOMERADO]
+        ws.reset_dimensions()
+        filas = ws.iter_rows(values_only=True)
+
+        encabezado = [str(v) if v is not None else "" for v in next(filas, ())]
+        faltantes = [c for c in COLUMNAS_CONGLOMERADO if c not in encabezado]
+        if faltantes:
+            raise KeyError(f"Columnas faltantes en {HOJA_CONGLOMERADO}: {faltantes}")
+
+        # Posición de la primera aparición de cada columna (igual que read_excel con duplicados)
+        indices = [encabezado.index(c) for c in COLUMNAS_CONGLOMERADO]
+        min_col, max_col = min(indices), max(indices)
+        relativos = [i - min_col for i in indices]
+        indice_profesional = relativos[COLUMNAS_CONGLOMERADO.index("NOMBRE DEL PROFESIONAL")]
+
+        vacias = []
+        for fila in ws.iter_rows(min_row=2, min_col=min_col + 1, max_col=max_col + 1, values_only=True):
+            if profesionales is not None and fila[indice_profesional] not in profesionales:
+                continue
+            convertida = [_convertir_celda(fila[i]) if i < len(fila) else "" for i in relativos]
+            if all(v == "" for v in convertida):
+                vacias.append(convertida)
+                continue
+            if vacias:
+                yield from vacias
+                vacias = []
+            yield convertida
+    finally:
+        wb.close()
+
+
+def _a_dataframe(filas):
+    if not filas:
+        return pd.DataFrame(columns=COLUMNAS_CONGLOMERADO)
+    return TextParser([list(COLUMNAS_CONGLOMERADO)] + filas, header=0, skip_blank_lines=False).read()
+
+
+def _leer_openpyxl(origen, profesionales):
+    return _a_dataframe(list(_filas_openpyxl(origen, profesionales)))
+
+
+def codificar_categorias(df):
+    """
+    Convierte a categorías las columnas de COLUMNAS_CATEGORICAS que quedaron como texto
+
+    Cada valor distinto se guarda una sola vez y las filas solo guardan un código entero;
+    las columnas numéricas se dejan como están porque ya ocupan un ancho fijo.
+
+    Args:
+        df (pandas.DataFrame): Conglomerado recién leído (se modifica en el lugar)
+
+    Returns:
+        pandas.DataFrame: El mismo DataFrame
+    """
+    for columna in COLUMNAS_CATEGORICAS:
+        tipo = df[columna].dtype
+        if pd.api.types.is_object_dtype(tipo) or pd.api.types.is_string_dtype(tipo):
+            df[columna] = df[columna].astype("category")
+    return df
+
+
+def leer_conglomerado(origen, profesionales=None, engine=None, categorias=True):
+    """
+    Lee la hoja CONGLOMERADO proyectando solo las columnas del generador
+
+    Con openpyxl la hoja se recorre en modo solo lectura fila por fila y las filas de
+    otros profesionales se descartan antes de convertir sus celdas.
+
+    Args:
+        origen: Ruta o archivo del Excel
+        profesionales (list, optional): Si se indica, solo se leen las filas de estos profesionales
+        engine (str, optional): "openpyxl" o "calamine"; por defecto el más rápido disponible
+        categorias (bool): Si es True las columnas de texto de la clave quedan como categorías
+
+    Returns:
+        pandas.DataFrame: Columnas de COLUMNAS_CONGLOMERADO con FECHA ATENCION como fecha
+    """
+    engine = engine or motor_disponible()
+    filtro = set(profesionales) if profesionales is not None else None
+
+    if engine == "openpyxl":
+        df = _leer_openpyxl(origen, filtro)
+    else:
+        df = pd.read_excel(origen, sheet_name=HOJA_CONGLOMERADO, engine=engine, usecols=COLUMNAS_CONGLOMERADO)
+        df = df[COLUMNAS_CONGLOMERADO]
+        if filtro is not None:
+            df = df[df["NOMBRE DEL PROFESIONAL"].isin(filtro)].reset_index(drop=True)
+
+    df["FECHA ATENCION"] = pd.to_datetime(df["FECHA ATENCION"])
+    return codificar_categorias(df) if categorias else df
+
+
+def iterar_conglomerado(origen, tamano_bloque=50000, profesionales=None):
+    """
+    Lee la hoja CONGLOMERADO en bloques de filas, sin cargarla completa en memoria
+
+    Siempre usa openpyxl en modo solo lectura (calamine carga la hoja entera). Cada bloque
+    se convierte igual que leer_conglomerado, pero la inferencia de tipos es por bloque.
+
+    Args:
+        origen: Ruta, bytes o archivo del Excel
+        tamano_bloque (int): Filas por bloque
+        profesionales (list, optional): Si se indica, solo se leen las filas de estos profesionales
+
+    Yields:
+        pandas.DataFrame: Bloque con las columnas de COLUMNAS_CONGLOMERADO
+    """
+    filtro = set(profesionales) if profesionales is not None else None
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        origen = io.BytesIO(origen)
+    elif hasattr(origen, "seek"):
+        origen.seek(0)
+    bloque = []
+    for fila in _filas_openpyxl(origen, filtro):
+        bloque.append(fila)
+        if len(bloque) >= tamano_bloque:
+            yield _preparar_bloque(_a_dataframe(bloque))
+            bloque = []
+    if bloque:
+        yield _preparar_bloque(_a_dataframe(bloque))
+
+
+def _preparar_bloque(df):
+    df["FECHA ATENCION"] = pd.to_datetime(df["FECHA ATENCION"])
+    return codificar_categorias(df)
@@ -0,0 +1,178 @@
+"""
+Resumen incremental de las descargas auditadas
+Mantiene el total y sketches HyperLogLog de profesionales e IPs distintos, de modo que
+las estadísticas se consultan en tiempo constante sin leer la tabla completa
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+
+
+class SketchHLL:
+    """
+    Estimador HyperLogLog de elementos distintos
+
+    Con precisión 12 usa 4096 registros (4 KB) y el error típico es ~1.6 %.
+    Mientras hay pocos elementos se guardan también sus hashes, y el conteo es exacto.
+    """
+
+    MAX_EXACTOS = 1024
+
+    def __init__(self, precision=12, registros=None, exactos=()):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registros = bytearray(registros) if registros is not None else bytearray(self.m)
+        self.exactos = set(exactos) if exactos is not None else None
+
+    def agregar(self, valor):
+        h = int.from_bytes(hashlib.sha1(str(valor).encode("utf-8")).digest()[:8], "big")
+        if self.exactos is not None:
+            self.exactos.add(h)
+            if len(self.exactos) > self.MAX_EXACTOS:
+                self.exactos = None
+        indice = h >> (64 - self.precision)
+        resto = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rango = min(64 - resto.bit_length(), 64 - self.precision) + 1
+        if rango > self.registros[indice]:
+            self.registros[indice] = rango
+
+    def combinar(self, otro):
+        """Suma al sketch los elementos de otro con la misma precisión"""
+        for i, rango in enumerate(otro.registros):
+            if rango > self.registros[i]:
+                self.registros[i] = rango
+        if self.exactos is not None and otro.exactos is not None:
+            self.exactos |= otro.exactos
+            if len(self.exactos) > self.MAX_EXACTOS:
+                self.exactos = None
+        else:
+            self.exactos = None
+
+    def estimar(self):
+        if self.exactos is not None:
+            return len(self.exactos)
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimado = alpha * m * m / sum(2.0 ** -r for r in self.registros)
+        vacios = self.registros.count(0)
+        if estimado <= 2.5 * m and vacios:
+            estimado = m * math.log(m / vacios)
+        return int(round(estimado))
+
+    def a_dict(self):
+        return {
+            "registros": base64.b64encode(bytes(self.registros)).decode("ascii"),
+            "exactos": sorted(self.exactos) if self.exactos is not None else None,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos, precision=12):
+        return cls(precision, base64.b64decode(datos["registros"]), datos.get("exactos"))
+
+
+class ResumenDescargas:
+    """
+    Contadores de descargas persistidos en un archivo JSON local
+
+    Attributes:
+        total (int): Número de descargas
+        profesionales (SketchHLL): Profesionales distintos
+        ips (SketchHLL): IPs distintas
+        marca (str | None): Fecha ISO a partir de la cual cuentan los registros locales;
+            lo anterior se carga una sola vez desde el backend
+        inicializado (bool): True si ya se cargó el histórico anterior a la marca
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.total = 0
+        self.profesionales = SketchHLL()
+        self.ips = SketchHLL()
+        self.marca = None
+        self.inicializado = False
+        self._lock = threading.Lock()
+        self._cargar()
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+            self.total = datos["total"]
+            self.profesionales = SketchHLL.desde_dict(datos["profesionales"])
+            self.ips = SketchHLL.desde_dict(datos["ips"])
+            self.marca = datos.get("marca")
+            self.inicializado = datos.get("inicializado", False)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Resumen de descargas ignorado: {str(e)}")
+
+    def guardar(self):
+        with self._lock:
+            datos = {
+                "total": self.total,
+                "profesionales": self.profesionales.a_dict(),
+                "ips": self.ips.a_dict(),
+                "marca": self.marca,
+                "inicializado": self.inicializado,
+            }
+        temporal = f"{self.ruta}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(datos, f)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"Error al guardar resumen de descargas: {str(e)}")
+
+    def registrar(self, profesional, ip, guardar=True):
+        """Suma una descarga al resumen"""
+        with self._lock:
+            self.total += 1
+            self.profesionales.agregar(profesional)
+            self.ips.agregar(ip)
+        if guardar:
+            self.guardar()
+
+    def inicializar(self, filas, marca=None):
+        """
+        Agrega el histórico anterior a la marca (solo la primera vez)
+
+        El histórico se cuenta aparte y se suma al resumen solo si se recorrió completo:
+        si la lectura falla a mitad, el resumen queda igual y el siguiente intento no
+        cuenta dos veces las filas ya leídas.
+
+        Args:
+            filas: Iterable de dicts con profesional_nombre e ip_address
+            marca (str, optional): Fecha hasta la que llega el histórico
+        """
+        total = 0
+        profesionales = SketchHLL(self.profesionales.precision)
+        ips = SketchHLL(self.ips.precision)
+        for fila in filas:
+            total += 1
+            profesionales.agregar(fila.get("profesional_nombre"))
+            ips.agregar(fila.get("ip_address"))
+        with self._lock:
+            self.total += total
+            self.profesionales.combinar(profesionales)
+            self.ips.combinar(ips)
+            self.inicializado = True
+            if marca is not None:
+                self.marca = marca
+        self.guardar()
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: total, profesionales_unicos e ips_unicas
+        """
+        with self._lock:
+            return {
+                "total": self.total,
+                "profesionales_unicos": self.profesionales.estimar(),
+                "ips_unicas": self.ips.estimar(),
+            }
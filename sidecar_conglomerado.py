@@ -0,0 +1,177 @@
+"""
+Copia columnar (Arrow IPC) del CONGLOMERADO en disco
+La primera carga de un archivo lo convierte; las siguientes leen el .arrow con memory-map en vez de parsear el Excel
+Requiere pyarrow (opcional): si no está instalado se lee siempre el Excel
+"""
+
+import importlib.util
+import io
+import os
+import tempfile
+
+from ingesta_conglomerado import COLUMNAS_CONGLOMERADO, leer_conglomerado
+
+# Se incrementa cuando cambia el contenido del sidecar para invalidar los anteriores
+VERSION_SIDECAR = b"2"
+
+DIRECTORIO_SIDECAR = os.getenv(
+    "SIDECAR_CONGLOMERADO_DIR",
+    os.path.join(tempfile.gettempdir(), "conglomerados_arrow")
+)
+LIMITE_SIDECAR_BYTES = int(float(os.getenv("SIDECAR_CONGLOMERADO_MB", "2048")) * 1024 * 1024)
+
+
+def pyarrow_disponible():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def ruta_sidecar(hash_archivo, directorio=DIRECTORIO_SIDECAR):
+    return os.path.join(directorio, f"{hash_archivo}.arrow")
+
+
+def _esquema_valido(esquema):
+    import pyarrow as pa
+
+    if (esquema.metadata or {}).get(b"version_sidecar") != VERSION_SIDECAR:
+        return False
+    if esquema.names != COLUMNAS_CONGLOMERADO:
+        return False
+    return pa.types.is_timestamp(esquema.field("FECHA ATENCION").type)
+
+
+def leer_sidecar(hash_archivo, directorio=DIRECTORIO_SIDECAR):
+    """
+    Lee el sidecar de un archivo si existe y su esquema coincide
+
+    Args:
+        hash_archivo (str): SHA-256 del Excel original
+        directorio (str): Carpeta de sidecars
+
+    Returns:
+        pandas.DataFrame | None: Datos del conglomerado, o None si hay que leer el Excel
+    """
+    if not pyarrow_disponible():
+        return None
+    import pyarrow as pa
+
+    ruta = ruta_sidecar(hash_archivo, directorio)
+    if not os.path.exists(ruta):
+        return None
+
+    try:
+        with pa.memory_map(ruta, "r") as fuente:
+            lector = pa.ipc.open_file(fuente)
+            if not _esquema_valido(lector.schema):
+                raise ValueError("Esquema del sidecar no coincide")
+            df = lector.read_all().to_pandas()
+    except Exception as e:
+        print(f"Sidecar descartado ({os.path.basename(ruta)}): {str(e)}")
+        _eliminar(ruta)
+        return None
+
+    # La fecha de modificación marca el último uso para la evicción
+    os.utime(ruta)
+    return df
+
+
+def escribir_sidecar(hash_archivo, df, directorio=DIRECTORIO_SIDECAR, limite_bytes=LIMITE_SIDECAR_BYTES):
+    """
+    Guarda el conglomerado como Arrow IPC y aplica el límite de tamaño de la carpeta
+
+    Args:
+        hash_archivo (str): SHA-256 del Excel original
+        df (pandas.DataFrame): Datos ya parseados
+        directorio (str): Carpeta de sidecars
+        limite_bytes (int): Tamaño máximo de la carpeta
+
+    Returns:
+        bool: True si se escribió el sidecar
+    """
+    if not pyarrow_disponible():
+        return False
+    import pyarrow as pa
+
+    try:
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # Columnas con tipos mezclados (p. ej. documentos numéricos y de texto)
+        print(f"No se pudo convertir el conglomerado a Arrow: {str(e)}")
+        return False
+
+    metadata = dict(tabla.schema.metadata or {})
+    metadata[b"version_sidecar"] = VERSION_SIDECAR
+    tabla = tabla.replace_schema_metadata(metadata)
+
+    os.makedirs(directorio, exist_ok=True)
+    ruta = ruta_sidecar(hash_archivo, directorio)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(temporal, "wb") as destino:
+            with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        print(f"No se pudo escribir el sidecar: {str(e)}")
+        _eliminar(temporal)
+        return False
+
+    evictar_sidecars(directorio, limite_bytes, conservar=ruta)
+    return True
+
+
+def evictar_sidecars(directorio=DIRECTORIO_SIDECAR, limite_bytes=LIMITE_SIDECAR_BYTES, conservar=None):
+    """
+    Elimina los sidecars usados hace más tiempo hasta quedar bajo el límite
+
+    Returns:
+        int: Número de archivos eliminados
+    """
+    try:
+        archivos = [
+            os.path.join(directorio, nombre)
+            for nombre in os.listdir(directorio) if nombre.endswith(".arrow")
+        ]
+        archivos = sorted(((os.stat(r).st_mtime, os.stat(r).st_size, r) for r in archivos))
+    except OSError:
+        return 0
+
+    total = sum(tamano for _, tamano, _ in archivos)
+    eliminados = 0
+    for _, tamano, ruta in archivos:
+        if total <= limite_bytes:
+            break
+        if ruta == conservar:
+            continue
+        if _eliminar(ruta):
+            total -= tamano
+            eliminados += 1
+    return eliminados
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+        return True
+    except OSError:
+        return False
+
+
+def cargar_conglomerado(contenido, hash_archivo, directorio=DIRECTORIO_SIDECAR):
+    """
+    Carga el conglomerado desde el sidecar o, si no hay, desde el Excel creando el sidecar
+
+    Args:
+        contenido (bytes): Contenido del Excel
+        hash_archivo (str): SHA-256 de contenido
+        directorio (str): Carpeta de sidecars
+
+    Returns:
+        pandas.DataFrame: Columnas de COLUMNAS_CONGLOMERADO
+    """
+    df = leer_sidecar(hash_archivo, directorio)
+    if df is not None:
+        return df
+
+    df = leer_conglomerado(io.BytesIO(contenido))
+    escribir_sidecar(hash_archivo, df, directorio)
+    return df